@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+"""Index over the whole moneydance account tree
+
+One recursive pass from the root maps UUID, full path name ('Food:Groceries'), plain name and
+account type to accounts, including nested categories and security sub-accounts. Lookups are
+dictionary hits, and to_frame() gives the tree as a DataFrame for filtering and joins.
+The index is a snapshot: rebuild it after accounts are added, renamed or deleted.
+"""
+from collections import OrderedDict
+import pandas as pd
+
+
+class AccountIndex(object):
+    _by_uuid: OrderedDict = None
+    _by_full_name: dict = None
+    _by_name: dict = None
+    _by_type: dict = None
+    _parent_ids: dict = None
+    _depths: dict = None
+
+    def __init__(self, root_account):
+        self._by_uuid = OrderedDict()
+        self._by_full_name = {}
+        self._by_name = {}
+        self._by_type = {}
+        self._parent_ids = {}
+        self._depths = {}
+        self._add_tree(root_account, None, 0)
+
+    @staticmethod
+    def from_account_book(account_book):
+        return AccountIndex(account_book.getRootAccount())
+
+    def _add_tree(self, account, parent_id: str, depth: int):
+        account_id = str(account.getUUID())
+        self._by_uuid[account_id] = account
+        # plain names can repeat across the tree (e.g. a security held in two brokerage accounts), the
+        # first in depth-first order wins; full names and UUIDs are unique
+        self._by_full_name.setdefault(str(account.getFullAccountName()), account)
+        self._by_name.setdefault(str(account.getAccountName()), account)
+        self._by_type.setdefault(str(account.getAccountType()), []).append(account)
+        self._parent_ids[account_id] = parent_id
+        self._depths[account_id] = depth
+        for sub_account in account.getSubAccounts():
+            self._add_tree(sub_account, account_id, depth + 1)
+
+    def __len__(self):
+        return len(self._by_uuid)
+
+    def __iter__(self):
+        return iter(self._by_uuid.values())
+
+    def __contains__(self, key):
+        return key in self._by_uuid or key in self._by_full_name or key in self._by_name
+
+    def __getitem__(self, key):
+        account = self.get(key)
+        if account is None:
+            raise KeyError(key)
+        return account
+
+    def get(self, key: str, default=None):
+        # UUID first, then full path name, then plain name
+        for accounts in (self._by_uuid, self._by_full_name, self._by_name):
+            if key in accounts:
+                return accounts[key]
+        return default
+
+    def get_by_uuid(self, account_id: str):
+        return self._by_uuid.get(account_id)
+
+    def get_by_full_name(self, full_name: str):
+        return self._by_full_name.get(full_name)
+
+    def get_by_type(self, account_type: str) -> list:
+        return list(self._by_type.get(account_type, []))
+
+    def get_types(self) -> list:
+        return list(self._by_type.keys())
+
+    def get_parent(self, account_id: str):
+        parent_id = self._parent_ids.get(account_id)
+        return self._by_uuid[parent_id] if parent_id is not None else None
+
+    def to_frame(self) -> pd.DataFrame:
+        # one row per account, in depth-first tree order
+        ids, parent_ids, depths, names, full_names, types, currencies = [], [], [], [], [], [], []
+        for account_id, account in self._by_uuid.items():
+            ids.append(account_id)
+            parent_ids.append(self._parent_ids[account_id])
+            depths.append(self._depths[account_id])
+            names.append(str(account.getAccountName()))
+            full_names.append(str(account.getFullAccountName()))
+            types.append(str(account.getAccountType()))
+            currency = account.getCurrencyType()
+            currencies.append(str(currency.getIDString()) if currency is not None else None)
+        return pd.DataFrame(OrderedDict([('id', ids), ('parent_id', parent_ids), ('depth', depths),
+                                         ('Name', names), ('FullName', full_names), ('Type', types),
+                                         ('Currency', currencies)]))
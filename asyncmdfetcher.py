@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+"""asyncio facade over MDFetcher and PyAccountWrapper
+
+usage: python asyncmdfetcher.py [path to .moneydance folder]
+
+All JVM-bound work runs on one dedicated executor thread attached to the JVM, so calls into the
+AccountBook are serialized and the event loop never blocks on a report. Many concurrent requests
+share one loaded book; identical shared calls made while one is already running (open, run_reports,
+the account wrapper query) await that call instead of queueing another. Every call takes an
+optional timeout. A timeout or cancellation only stops the caller from waiting: a plain call that
+is still queued never runs, but a shared call still runs for the others awaiting it, and a call
+already inside Java finishes on the JVM thread with its result dropped.
+
+The report methods are whole pipelines in one JVM job (BulkSecInfo, snapshot report, net positions),
+because their stages share state on the MDFetcher: as separate jobs, another caller's stage could
+run in between, e.g. one request's report computed against another's last_bday. Use call() for
+single MDFetcher stages only when no other caller uses the same stages concurrently.
+"""
+import sys
+import asyncio
+import functools
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import pandas as pd
+import jpype
+
+from mdfetcher import MDFetcher, MODULE_DIRECTORY
+
+
+def attach_to_jvm():
+    # JPype attaches threads on first use; attaching as a daemon keeps this thread from holding up JVM shutdown
+    if jpype.isJVMStarted() and not jpype.java.lang.Thread.isAttached():
+        jpype.java.lang.Thread.attachAsDaemon()
+
+
+class AsyncMDFetcher(object):
+    _md_bundled_jar_location: str = None
+    _md_file_location: str = None
+    _md_fetcher: MDFetcher = None
+    _account_wrappers: list = None
+    _executor: ThreadPoolExecutor = None
+    _inflight: dict = None
+    _timeout: float = None
+
+    def __init__(self, md_bundled_jar_location: str, md_file_location: str, timeout: float = None):
+        # call open() (or use 'async with') before anything else; the book is loaded on the JVM thread
+        self._md_bundled_jar_location = md_bundled_jar_location
+        self._md_file_location = md_file_location
+        self._timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='md-jvm')
+        self._inflight = {}
+
+    async def open(self):
+        if self._md_fetcher is None:
+            self._md_fetcher = await self.run_on_jvm(MDFetcher, self._md_bundled_jar_location,
+                                                     self._md_file_location, shared_key='open')
+        return self
+
+    async def close(self):
+        if self._md_fetcher is not None:
+            await self.run_on_jvm(self._md_fetcher.close_md_file)
+            self._md_fetcher = None
+            self._account_wrappers = None
+        self._executor.shutdown(wait=False)
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def __aexit__(self, exc_type, exc_value, exc_traceback):
+        await self.close()
+
+    def get_md_fetcher(self) -> MDFetcher:
+        # for reading already computed frames; don't call into java through it from the event loop
+        return self._md_fetcher
+
+    @staticmethod
+    def _run_attached(func, *args, **kwargs):
+        attach_to_jvm()
+        return func(*args, **kwargs)
+
+    async def run_on_jvm(self, func, *args, timeout: float = None, shared_key=None, **kwargs):
+        # runs func on the JVM thread; calls with the same shared_key while one is pending await that one
+        # (shielded, so one caller's timeout doesn't cancel the others)
+        timeout = timeout if timeout is not None else self._timeout
+        loop = asyncio.get_running_loop()
+        if shared_key is None:
+            return await asyncio.wait_for(loop.run_in_executor(
+                self._executor, functools.partial(self._run_attached, func, *args, **kwargs)), timeout)
+        future = self._inflight.get(shared_key)
+        if future is None:
+            future = loop.run_in_executor(self._executor, functools.partial(self._run_attached, func, *args, **kwargs))
+            self._inflight[shared_key] = future
+            future.add_done_callback(lambda done: self._inflight.pop(shared_key, None)
+                                     if self._inflight.get(shared_key) is done else None)
+        return await asyncio.wait_for(asyncio.shield(future), timeout)
+
+    async def call(self, method_name: str, *args, timeout: float = None, **kwargs):
+        # any MDFetcher method by name, e.g. await fetcher.call('calc_report_panel', start=..., end=...)
+        if self._md_fetcher is None:
+            raise ValueError("AsyncMDFetcher is not open")
+        return await self.run_on_jvm(getattr(self._md_fetcher, method_name), *args, timeout=timeout, **kwargs)
+
+    async def call_pipeline(self, steps: list, getter_name: str, timeout: float = None):
+        # runs (method_name, args, kwargs) steps and reads the result back in one JVM job, so a request queued
+        # behind this one can't change the shared state between the steps or before the frame is returned
+        if self._md_fetcher is None:
+            raise ValueError("AsyncMDFetcher is not open")
+        md_fetcher = self._md_fetcher
+
+        def run_steps():
+            for method_name, args, kwargs in steps:
+                getattr(md_fetcher, method_name)(*args, **kwargs)
+            return getattr(md_fetcher, getter_name)()
+        return await self.run_on_jvm(run_steps, timeout=timeout)
+
+    async def call_and_get(self, method_name: str, getter_name: str, *args, timeout: float = None, **kwargs):
+        return await self.call_pipeline([(method_name, args, kwargs)], getter_name, timeout=timeout)
+
+    async def calc_snap_report(self, last_bday: pd.Timestamp = None, remove_aggregates=True,
+                               timeout: float = None) -> pd.DataFrame:
+        # loads BulkSecInfo for last_bday and computes the report in the same job
+        return await self.call_pipeline([('load_BulkSecInfo', (last_bday,), {}),
+                                         ('calc_snap_report', (remove_aggregates,), {})],
+                                        'get_snapshot_report', timeout=timeout)
+
+    async def derive_net_positions(self, last_bday: pd.Timestamp = None, timeout: float = None) -> pd.DataFrame:
+        return await self.call_pipeline([('load_BulkSecInfo', (last_bday,), {}), ('calc_snap_report', (), {}),
+                                         ('derive_net_positions', (), {})], 'get_net_positions', timeout=timeout)
+
+    async def extract_all_currency_data(self, timeout: float = None, **filters) -> pd.DataFrame:
+        return await self.call_and_get('extract_all_currency_data', 'get_all_currency_data', timeout=timeout,
+                                       **filters)
+
+    async def extract_transactions(self, timeout: float = None, **filters) -> pd.DataFrame:
+        return await self.call_and_get('extract_transactions', 'get_transactions', timeout=timeout, **filters)
+
+    async def run_reports(self, last_bday: pd.Timestamp = None, current_positions=True,
+                          timeout: float = None) -> dict:
+        # concurrent requests for the same reports share one run
+        if self._md_fetcher is None:
+            raise ValueError("AsyncMDFetcher is not open")
+        return await self.run_on_jvm(self._md_fetcher.run_reports, last_bday, current_positions, timeout=timeout,
+                                     shared_key=('run_reports', last_bday, current_positions))
+
+    async def get_account_wrappers(self, timeout: float = None) -> list:
+        if self._account_wrappers is None:
+            def query_accounts():
+                from pyaccountwrapper import PyAccountWrapper
+                return PyAccountWrapper.query_accounts_list(self._md_fetcher.get_account_book())
+            self._account_wrappers = await self.run_on_jvm(query_accounts, timeout=timeout,
+                                                           shared_key='account_wrappers')
+        return self._account_wrappers
+
+    async def get_net_worth_series(self, start, end, freq: str = 'D', timeout: float = None) -> pd.DataFrame:
+        account_wrappers = await self.get_account_wrappers(timeout=timeout)
+        return await self.run_on_jvm(
+            lambda: pd.concat([account_wrapper.get_net_worth_series(start, end, freq)
+                               for account_wrapper in account_wrappers], ignore_index=True), timeout=timeout)
+
+
+async def run_demo(md_bundled_jar_location: str, md_file_location: str):
+    async with AsyncMDFetcher(md_bundled_jar_location, md_file_location, timeout=600.) as md_fetcher:
+        # both requests share one report run; the net worth query queues behind it on the JVM thread
+        frames, same_frames, net_worth = await asyncio.gather(
+            md_fetcher.run_reports(), md_fetcher.run_reports(),
+            md_fetcher.get_net_worth_series(20090801, 20100401, 'MS'))
+        print("shared report run? {0}".format(frames is same_frames))
+        print("Here are net positions...")
+        print(frames['net_positions'])
+        print("and month-start net worth...")
+        print(net_worth)
+
+
+def main():
+    try:
+        md_folder = sys.argv[1] if len(sys.argv) > 1 else \
+            str(Path(MODULE_DIRECTORY, 'resources/testMD02.moneydance').absolute())
+        moneydance_jar_path = str(Path(MODULE_DIRECTORY, './lib/invextension_bundled.jar').absolute())
+        asyncio.run(run_demo(moneydance_jar_path, md_folder))
+    except Exception as ex:
+        print("Exception in user code:")
+        print('-' * 60)
+        print(str(ex))
+        traceback.print_exc(file=sys.stdout)
+        print('-' * 60)
+
+
+if __name__ == '__main__':
+    main()
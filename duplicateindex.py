@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""Hash index of an account register for duplicate detection during imports
+
+Existing transactions are hashed once on (amount, normalized payee, day), so each incoming row
+is checked with a handful of dict probes across the date window instead of scanning the register.
+"""
+import re
+from collections import Counter
+from datetime import date
+
+NON_ALPHANUMERIC = re.compile(r'[^0-9a-z]+')
+
+
+def normalize_payee(payee) -> str:
+    # case, punctuation and spacing differ between bank exports of the same statement
+    return NON_ALPHANUMERIC.sub(' ', str(payee).lower()).strip()
+
+
+def date_int_to_ordinal(date_int: int) -> int:
+    date_int = int(date_int)
+    return date(date_int // 10000, date_int // 100 % 100, date_int % 100).toordinal()
+
+
+class DuplicateIndex(object):
+    _counts: Counter = None
+    _offsets: list = None
+
+    def __init__(self, rows=(), date_window: int = 3):
+        # rows are (dateInt, amount in cents, payee)
+        self._counts = Counter()
+        # nearest day first, so a match on the exact date wins over one a day away
+        self._offsets = sorted(range(-date_window, date_window + 1), key=abs)
+        for date_int, amount, payee in rows:
+            self.add(date_int, amount, payee)
+
+    @classmethod
+    def from_account(cls, account_book, account, date_window: int = 3):
+        # the payee lives on the parent; for splits in this register getDescription() is the split memo
+        from com.infinitekind.moneydance.model import ParentTxn
+        rows = []
+        for txn in account_book.getTransactionSet().getTransactionsForAccount(account).iterableTxns():
+            parent = txn if isinstance(txn, ParentTxn) else txn.getParentTxn()
+            rows.append((txn.getDateInt(), txn.getValue(), parent.getDescription()))
+        return cls(rows, date_window)
+
+    def __len__(self):
+        return sum(self._counts.values())
+
+    def get_key(self, day: int, amount: int, payee) -> tuple:
+        return int(amount), normalize_payee(payee), day
+
+    def add(self, date_int: int, amount: int, payee):
+        self._counts[self.get_key(date_int_to_ordinal(date_int), amount, payee)] += 1
+
+    def find(self, date_int: int, amount: int, payee):
+        amount, payee_key, day = self.get_key(date_int_to_ordinal(date_int), amount, payee)
+        for offset in self._offsets:
+            key = (amount, payee_key, day + offset)
+            if self._counts.get(key, 0) > 0:
+                return key
+        return None
+
+    def contains(self, date_int: int, amount: int, payee) -> bool:
+        return self.find(date_int, amount, payee) is not None
+
+    def match(self, date_int: int, amount: int, payee) -> bool:
+        # consumes the matched entry, so two identical incoming rows need two existing ones
+        key = self.find(date_int, amount, payee)
+        if key is None:
+            return False
+        self._counts[key] -= 1
+        return True
@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+"""Bulk transfer between NumPy arrays and Java primitive arrays
+
+JPype exposes Java primitive arrays (long[], double[], int[], ...) through the buffer protocol, so
+a whole array moves between the JVM and NumPy in one copy instead of one boxed value per element.
+Use these wherever a Java API takes or returns primitive arrays.
+"""
+import numpy as np
+import jpype
+
+JAVA_DTYPES = {'boolean': np.bool_, 'byte': np.int8, 'short': np.int16, 'int': np.int32, 'long': np.int64,
+               'float': np.float32, 'double': np.float64}
+
+
+def get_java_type(java_type: str):
+    if java_type not in JAVA_DTYPES:
+        raise ValueError("no primitive java type {0}, expected one of {1}".format(java_type, list(JAVA_DTYPES)))
+    return getattr(jpype, 'J' + java_type.capitalize())
+
+
+def to_java_array(values, java_type: str):
+    # values are cast to the matching dtype first; JPype then fills the java array from the buffer in bulk
+    array_type = jpype.JArray(get_java_type(java_type))
+    return array_type(np.ascontiguousarray(values, dtype=JAVA_DTYPES[java_type]))
+
+
+def new_java_array(size: int, java_type: str):
+    return jpype.JArray(get_java_type(java_type))(size)
+
+
+def to_numpy(java_array) -> np.ndarray:
+    # one bulk copy through the buffer protocol; the result owns its memory, so it outlives the java array
+    return np.array(memoryview(java_array))
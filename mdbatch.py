@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""Run the MDFetcher report pipeline over many moneydance books in parallel
+
+usage: python mdbatch.py [workers] [timeout seconds] book1.moneydance book2.moneydance ...
+
+Each book gets its own worker process (and so its own JVM, which JPype cannot restart or share
+across a fork), at most `workers` at a time. A book that runs past the timeout has its process
+terminated, and the results of all other books are merged into one DataFrame per report, keyed by book.
+"""
+import sys
+import os
+import time
+import queue
+import traceback
+import multiprocessing
+from collections import OrderedDict
+from pathlib import Path
+import pandas as pd
+
+from mdfetcher import MDFetcher, MODULE_DIRECTORY
+
+
+def run_book(md_bundled_jar_location: str, md_file_location: str, last_bday: pd.Timestamp = None,
+             cache_dir: str = None) -> dict:
+    if cache_dir is not None:
+        from mdcache import fetch_md_results
+        return fetch_md_results(md_bundled_jar_location, md_file_location, cache_dir, last_bday)
+    md_fetcher = MDFetcher(md_bundled_jar_location=md_bundled_jar_location, md_file_location=md_file_location)
+    frames = md_fetcher.run_reports(last_bday)
+    md_fetcher.close_md_file()
+    return frames
+
+
+def book_worker(result_queue, md_bundled_jar_location: str, md_file_location: str, last_bday, cache_dir):
+    try:
+        result_queue.put(('ok', run_book(md_bundled_jar_location, md_file_location, last_bday, cache_dir), ''))
+    except Exception:
+        result_queue.put(('error', None, traceback.format_exc()))
+
+
+def run_books(md_bundled_jar_location: str, md_file_locations: list, workers: int = None, timeout: float = 600.,
+              last_bday: pd.Timestamp = None, cache_dir: str = None) -> dict:
+    # returns one frame per report with a leading 'book' index level, plus a 'status' frame per book
+    context = multiprocessing.get_context('spawn')
+    workers = workers if workers else os.cpu_count() or 1
+    pending = list(md_file_locations)
+    running = OrderedDict()
+    results, statuses = OrderedDict(), []
+    while pending or running:
+        while pending and len(running) < workers:
+            md_file_location = pending.pop(0)
+            result_queue = context.Queue()
+            process = context.Process(target=book_worker, name='mdbatch-{0}'.format(Path(md_file_location).name),
+                                      args=(result_queue, md_bundled_jar_location, md_file_location, last_bday,
+                                            cache_dir))
+            process.start()
+            running[md_file_location] = (process, result_queue, time.perf_counter())
+        for md_file_location, (process, result_queue, start) in list(running.items()):
+            elapsed = time.perf_counter() - start
+            try:
+                # read before joining: a child with a large result cannot exit until it has been consumed
+                status, frames, error = result_queue.get_nowait()
+            except queue.Empty:
+                if elapsed > timeout:
+                    process.terminate()
+                    status, frames, error = 'timeout', None, 'no result after {0:.0f}s'.format(timeout)
+                elif not process.is_alive():
+                    # the child may have put its result and exited since the poll above; its queue feeder
+                    # flushes before exit, so one short blocking read tells a lost result from a crash
+                    try:
+                        status, frames, error = result_queue.get(timeout=1.)
+                    except queue.Empty:
+                        status, frames, error = 'error', None, 'worker exited with code {0}'.format(process.exitcode)
+                else:
+                    continue
+            process.join()
+            del running[md_file_location]
+            statuses.append({'book': md_file_location, 'status': status, 'seconds': elapsed, 'error': error})
+            print("{0}: {1} after {2:.1f}s".format(md_file_location, status, elapsed))
+            if frames is not None:
+                results[md_file_location] = frames
+        time.sleep(0.05)
+    merged = OrderedDict()
+    for name in MDFetcher.report_names:
+        book_frames = [frames[name] for frames in results.values()]
+        merged[name] = pd.concat(book_frames, keys=list(results.keys()), names=['book']) if book_frames else None
+    merged['status'] = pd.DataFrame(statuses, columns=['book', 'status', 'seconds', 'error'])
+    return merged
+
+
+def main():
+    try:
+        workers = int(sys.argv[1]) if len(sys.argv) > 1 else None
+        timeout = float(sys.argv[2]) if len(sys.argv) > 2 else 600.
+        md_folders = sys.argv[3:] if len(sys.argv) > 3 else \
+            [str(Path(MODULE_DIRECTORY, 'resources/testMD02.moneydance').absolute())]
+        moneydance_jar_path = str(Path(MODULE_DIRECTORY, './lib/invextension_bundled.jar').absolute())
+        results = run_books(moneydance_jar_path, md_folders, workers, timeout)
+        print(results['status'])
+        print("Here are net positions across books...")
+        print(results['net_positions'])
+    except Exception as ex:
+        print("Exception in user code:")
+        print('-' * 60)
+        print(str(ex))
+        traceback.print_exc(file=sys.stdout)
+        print('-' * 60)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+"""Benchmarks for the MDFetcher extraction and bulk update paths
+
+usage: python mdbenchmark.py [path to .moneydance folder]
+(defaults to the sample data set in resources; a book with a few hundred securities and
+full daily price histories gives representative numbers; write benchmarks use a scratch copy)
+
+       python mdbenchmark.py --scaling results.json [--sizes 1000 10000 100000 1000000]
+(generates synthetic books of each size and times every pipeline stage, written to JSON)
+"""
+import sys
+import json
+import argparse
+import shutil
+import tempfile
+import traceback
+import time
+import tracemalloc
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from mdfetcher import MDFetcher, MODULE_DIRECTORY
+from mdsynthetic import make_transaction_rows, generate_book
+import mdjvm
+
+
+def time_call(func, *args, repeat: int = 3, **kwargs):
+    # best-of-n wall time in seconds, plus the result of the last call
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def legacy_extract_all_currency_data(bulk_sec_info) -> pd.DataFrame:
+    # the original str()-and-split path, kept here as the baseline
+    from com.moneydance.modules.features.invextension import BulkSecInfo
+    currency_data_py = []
+    currencies_info_java = [x for x in bulk_sec_info.ListAllCurrenciesInfo()]
+    for currency_info in currencies_info_java:
+        currency_data_py.append(list(ele.strip(" '[]") for ele in str(currency_info).split(',')))
+    header = [x.strip() for x in str(BulkSecInfo.listCurrencySnapshotHeader()).split(',')]
+    all_currencies_data = pd.DataFrame(data=currency_data_py, columns=header)
+    all_currencies_data['Date'] = all_currencies_data['Date'].astype('datetime64[ns]')
+    for item in ['PricebyDate', 'PriceByDate(Adjust)']:
+        all_currencies_data[item] = all_currencies_data[item].astype('float')
+    return all_currencies_data
+
+
+def benchmark_currency_extraction(md_fetcher: MDFetcher, repeat: int = 3) -> dict:
+    legacy_s, legacy_df = time_call(legacy_extract_all_currency_data, md_fetcher._bulkSecInfo, repeat=repeat)
+    typed_s, _ = time_call(md_fetcher.extract_all_currency_data, repeat=repeat)
+    typed_df = md_fetcher.get_all_currency_data()
+    return {'securities': int(typed_df['id'].nunique()), 'legacy_rows': len(legacy_df), 'typed_rows': len(typed_df),
+            'legacy_s': legacy_s, 'typed_s': typed_s, 'speedup': legacy_s / typed_s}
+
+
+def legacy_report_table_to_frame(header: list, rows) -> pd.DataFrame:
+    # the original cell-by-cell conversion from calc_snap_report, kept here as the baseline
+    from com.moneydance.modules.features.invextension import InvestmentAccountWrapper
+    from com.moneydance.modules.features.invextension import SecurityAccountWrapper
+    from com.moneydance.modules.features.invextension import SecurityTypeWrapper
+    from com.moneydance.modules.features.invextension import SecuritySubTypeWrapper
+    from com.moneydance.modules.features.invextension import CurrencyWrapper
+    from com.moneydance.modules.features.invextension.SecurityReport import MetricEntry
+
+    def get_display_val(obj):
+        if any([isinstance(obj, InvestmentAccountWrapper),
+                isinstance(obj, SecurityAccountWrapper),
+                isinstance(obj, SecurityTypeWrapper),
+                isinstance(obj, SecuritySubTypeWrapper),
+                isinstance(obj, CurrencyWrapper)]):
+            return str(obj.getName())
+        elif isinstance(obj, MetricEntry):
+            return obj.getDisplayValue() if obj.getDisplayValue() < sys.float_info.max else float('nan')
+        else:
+            return None
+    all_data = []
+    for row in rows:
+        row_data = {}
+        for i, ele in enumerate(row):
+            row_data[header[i]] = get_display_val(ele)
+        all_data.append(row_data)
+    return pd.DataFrame(all_data)
+
+
+def benchmark_report_conversion(md_fetcher: MDFetcher, min_rows: int = 2000, repeat: int = 3) -> dict:
+    # the sample book's tables are small, so their rows are repeated up to min_rows for both converters
+    from com.moneydance.modules.features.invextension import TotalSnapshotReport
+    from com.moneydance.modules.features.invextension import TotalFromToReport
+    results = {}
+    for report_name, report_class in [('snapshot', TotalSnapshotReport), ('from_to', TotalFromToReport)]:
+        report = report_class(md_fetcher._reportConfig, md_fetcher._bulkSecInfo)
+        report.calcReport()
+        header = [str(col).replace('\n', ' ') for col in report.getModelHeader()]
+        rows = list(report.getReportTable())
+        rows = rows * max(1, -(-min_rows // max(len(rows), 1)))
+        legacy_s, _ = time_call(legacy_report_table_to_frame, header, rows, repeat=repeat)
+        converter_s, _ = time_call(md_fetcher.get_report_converter().to_frame, header, rows, repeat=repeat)
+        results.update({report_name + '_rows': len(rows), report_name + '_legacy_s': legacy_s,
+                        report_name + '_converter_s': converter_s, report_name + '_speedup': legacy_s / converter_s})
+    return results
+
+
+def benchmark_array_transfer(n_values: int = 1000000, repeat: int = 3) -> dict:
+    # per-element transfer (one boundary crossing and boxed value each) vs one buffer copy, both directions
+    import mdarrays
+    values = np.random.default_rng(0).random(n_values)
+    java_values = mdarrays.to_java_array(values, 'double')
+
+    def java_to_numpy_per_element():
+        return np.array([float(value) for value in java_values])
+
+    def numpy_to_java_per_element():
+        java_array = mdarrays.new_java_array(n_values, 'double')
+        for i, value in enumerate(values):
+            java_array[i] = float(value)
+        return java_array
+    per_element_s, _ = time_call(java_to_numpy_per_element, repeat=repeat)
+    buffer_s, copied = time_call(mdarrays.to_numpy, java_values, repeat=repeat)
+    per_element_in_s, _ = time_call(numpy_to_java_per_element, repeat=repeat)
+    buffer_in_s, _ = time_call(mdarrays.to_java_array, values, 'double', repeat=repeat)
+    assert np.array_equal(copied, values)
+    return {'values': n_values, 'to_numpy_per_element_s': per_element_s, 'to_numpy_buffer_s': buffer_s,
+            'to_numpy_speedup': per_element_s / buffer_s, 'to_java_per_element_s': per_element_in_s,
+            'to_java_buffer_s': buffer_in_s, 'to_java_speedup': per_element_in_s / buffer_in_s}
+
+
+class LegacyAccountWrapper(object):
+    # the original eager PyAccountWrapper construction, kept here as the baseline: java attributes are
+    # converted up front and security sub-account wrappers are built recursively, each with a __dict__
+    def __init__(self, account_book, account, is_security: bool = False):
+        self._account_book = account_book
+        self._account = account
+        self._id = str(account.getUUID())
+        self._name = str(account.getAccountName())
+        self._type = str(account.getAccountType())
+        self._is_investment = self._type == 'INVESTMENT'
+        self._is_security = is_security
+        self._price_store = None
+        self._security_account_wrappers = [LegacyAccountWrapper(account_book, security_account, True)
+                                           for security_account in account.getSubAccounts()] \
+            if self._is_investment else None
+
+    def get_name(self):
+        return self._name
+
+    def get_security_account_wrappers(self):
+        return self._security_account_wrappers
+
+
+def build_legacy_account_tree(account_book) -> list:
+    return [LegacyAccountWrapper(account_book, account) for account in account_book.getRootAccount().getSubAccounts()
+            if str(account.getAccountType()) not in ['INCOME', 'EXPENSE']]
+
+
+def touch_account_tree(account_wrappers: list) -> int:
+    # reads every name, including security sub-accounts, as a net worth query would
+    names = 0
+    for account_wrapper in account_wrappers:
+        names += len(account_wrapper.get_name())
+        for security_account_wrapper in account_wrapper.get_security_account_wrappers() or []:
+            names += len(security_account_wrapper.get_name())
+    return names
+
+
+def measure_account_tree(build, account_book) -> dict:
+    # traced python memory after construction and after every wrapper has been touched
+    tracemalloc.start()
+    start = time.perf_counter()
+    account_wrappers = build(account_book)
+    build_s = time.perf_counter() - start
+    build_bytes = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    touch_account_tree(account_wrappers)
+    touch_s = time.perf_counter() - start
+    touched_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return {'build_s': build_s, 'build_bytes': build_bytes, 'touch_s': touch_s, 'touched_bytes': touched_bytes}
+
+
+def benchmark_account_tree(md_fetcher: MDFetcher) -> dict:
+    # eager legacy wrappers vs the lazy, slotted PyAccountWrapper; a book generated by mdsynthetic with
+    # a few thousand securities shows the difference best
+    from pyaccountwrapper import PyAccountWrapper
+    account_book = md_fetcher.get_account_book()
+    results = {}
+    for name, build in [('eager', build_legacy_account_tree), ('lazy', PyAccountWrapper.query_accounts_list)]:
+        results.update({name + '_' + key: value for key, value in measure_account_tree(build, account_book).items()})
+    results['build_speedup'] = results['eager_build_s'] / results['lazy_build_s']
+    return results
+
+
+def copy_md_folder(md_folder: str) -> str:
+    # write benchmarks run against a scratch copy, never the original book
+    scratch_folder = Path(tempfile.mkdtemp(prefix='mdbenchmark_'), Path(md_folder).name)
+    shutil.copytree(md_folder, scratch_folder)
+    return str(scratch_folder)
+
+
+def find_account_uuid(md_fetcher: MDFetcher, account_type: str) -> str:
+    accounts = md_fetcher.get_account_index().get_by_type(account_type)
+    if not accounts:
+        raise ValueError("no {0} account in this book".format(account_type))
+    return str(accounts[0].getUUID())
+
+
+def benchmark_transaction_insert(md_fetcher: MDFetcher, n_rows: int = 10000) -> dict:
+    rows = make_transaction_rows([find_account_uuid(md_fetcher, 'BANK')], [find_account_uuid(md_fetcher, 'EXPENSE')],
+                                 n_rows, pd.Timestamp.now().normalize(), np.random.default_rng(0), n_days=365)
+    build_s, parent_count = time_call(md_fetcher.insert_transactions, rows, save=False, repeat=1)
+    start = time.perf_counter()
+    md_fetcher.get_account_book().save()
+    save_s = time.perf_counter() - start
+    return {'rows': n_rows, 'transactions': parent_count, 'build_and_sync_s': build_s, 'save_s': save_s,
+            'rows_per_s': n_rows / (build_s + save_s)}
+
+
+SCALING_SIZES = [1000, 10000, 100000, 1000000]
+
+
+def time_stage(timings: dict, stage: str, func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    timings[stage + '_s'] = time.perf_counter() - start
+    return result
+
+
+def benchmark_scaling(md_bundled_jar_location: str, sizes: list = SCALING_SIZES, work_dir: str = None,
+                      output_json: str = None, **generator_options) -> dict:
+    # one synthetic book per size, each timed stage by stage; the JVM starts once per process
+    work_dir = work_dir if work_dir is not None else tempfile.mkdtemp(prefix='mdbenchmark_scaling_')
+    results = {'sizes': list(sizes), 'generator_options': generator_options, 'runs': []}
+    time_stage(results, 'jvm_start', mdjvm.ensure_jvm, md_bundled_jar_location)
+    time_stage(results, 'class_load', mdjvm.load_classes)
+    results['jvm_startup'] = mdjvm.get_startup_report()
+    from pyaccountwrapper import PyAccountWrapper
+    for size in sizes:
+        timings = {'transactions': size}
+        md_folder = str(Path(work_dir, 'synthetic_{0:d}.moneydance'.format(size)))
+        book = time_stage(timings, 'generate', generate_book, md_folder, md_bundled_jar_location, size,
+                          **generator_options)
+        # report stages scale with the investment transactions, the rest with bank transactions
+        timings.update({'investment_transactions': book['investment_transactions'],
+                        'securities': book['securities']})
+        md_fetcher = time_stage(timings, 'loadDataModel', MDFetcher, md_bundled_jar_location, md_folder)
+        time_stage(timings, 'BulkSecInfo', md_fetcher.load_BulkSecInfo)
+        time_stage(timings, 'calc_snap_report', md_fetcher.calc_snap_report)
+        time_stage(timings, 'derive_net_positions', md_fetcher.derive_net_positions)
+        time_stage(timings, 'extract_all_currency_data', md_fetcher.extract_all_currency_data)
+        time_stage(timings, 'extract_transactions', md_fetcher.extract_transactions)
+        account_wrappers = time_stage(timings, 'query_accounts_list', PyAccountWrapper.query_accounts_list,
+                                      md_fetcher.get_account_book())
+        date_int = int(pd.Timestamp.now().strftime('%Y%m%d'))
+        time_stage(timings, 'get_net_worth_as_of', lambda: [account_wrapper.get_net_worth_as_of(date_int)
+                                                            for account_wrapper in account_wrappers])
+        timings.update({'snapshot_rows': len(md_fetcher.get_snapshot_report()),
+                        'currency_rows': len(md_fetcher.get_all_currency_data()),
+                        'transaction_rows': len(md_fetcher.get_transactions())})
+        md_fetcher.close_md_file()
+        results['runs'].append(timings)
+        print(pd.Series(timings))
+        if output_json is not None:
+            # rewritten after every size, so a long run leaves usable partial results
+            with open(output_json, 'w') as json_file:
+                json.dump(results, json_file, indent=2)
+    return results
+
+
+def main():
+    try:
+        parser = argparse.ArgumentParser(description="MDFetcher benchmarks")
+        parser.add_argument('md_folder', nargs='?',
+                            default=str(Path(MODULE_DIRECTORY, 'resources/testMD02.moneydance').absolute()))
+        parser.add_argument('--scaling', metavar='JSON', help="run the synthetic scaling benchmark into this file")
+        parser.add_argument('--sizes', type=int, nargs='+', default=SCALING_SIZES)
+        args = parser.parse_args()
+        md_folder = args.md_folder
+        moneydance_jar_path = str(Path(MODULE_DIRECTORY, './lib/invextension_bundled.jar').absolute())
+        if args.scaling:
+            benchmark_scaling(moneydance_jar_path, args.sizes, output_json=args.scaling)
+            return
+        md_fetcher = MDFetcher(md_bundled_jar_location=moneydance_jar_path, md_file_location=copy_md_folder(md_folder))
+        md_fetcher.load_BulkSecInfo()
+        print("currency snapshot extraction, legacy vs typed...")
+        print(pd.Series(benchmark_currency_extraction(md_fetcher)))
+        print("report table conversion, cell by cell vs column-wise...")
+        print(pd.Series(benchmark_report_conversion(md_fetcher)))
+        print("java primitive array transfer, per element vs buffer...")
+        print(pd.Series(benchmark_array_transfer()))
+        print("account wrapper tree, eager vs lazy...")
+        print(pd.Series(benchmark_account_tree(md_fetcher)))
+        print("bulk transaction insert...")
+        print(pd.Series(benchmark_transaction_insert(md_fetcher)))
+        md_fetcher.close_md_file()
+    except Exception as ex:
+        print("Exception in user code:")
+        print('-' * 60)
+        print(str(ex))
+        traceback.print_exc(file=sys.stdout)
+        print('-' * 60)
+
+
+if __name__ == '__main__':
+    main()
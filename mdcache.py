@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+"""On-disk cache for MDFetcher results
+
+Frames are stored as Parquet under a key built from the data folder's modification time and
+the report configuration, so an unchanged book is answered from disk without starting Java.
+"""
+import sys
+import os
+import json
+import hashlib
+import traceback
+from pathlib import Path
+import pandas as pd
+from pandas.tseries.offsets import BDay
+
+from mdfetcher import MDFetcher, MODULE_DIRECTORY
+
+
+def get_folder_mtime_ns(md_file_location: str) -> int:
+    # moneydance writes into subfolders of the .moneydance folder, so take the newest entry in the tree
+    latest = os.stat(md_file_location).st_mtime_ns
+    for dir_path, dir_names, file_names in os.walk(md_file_location):
+        for name in dir_names + file_names:
+            latest = max(latest, os.stat(os.path.join(dir_path, name)).st_mtime_ns)
+    return latest
+
+
+class MDResultCache(object):
+    frame_names = MDFetcher.report_names
+    _cache_dir: Path = None
+    _md_file_location: str = None
+    _report_config: dict = None
+
+    def __init__(self, cache_dir: str, md_file_location: str, report_config: dict):
+        self._cache_dir = Path(cache_dir).absolute()
+        self._md_file_location = str(Path(md_file_location).absolute())
+        self._report_config = report_config
+
+    def get_key(self) -> str:
+        key_source = json.dumps({'md_file_location': self._md_file_location,
+                                 'mtime_ns': get_folder_mtime_ns(self._md_file_location),
+                                 'report_config': self._report_config}, sort_keys=True, default=str)
+        return hashlib.sha1(key_source.encode('utf-8')).hexdigest()
+
+    def get_entry_dir(self, key: str = None) -> Path:
+        return self._cache_dir / (key if key is not None else self.get_key())
+
+    def load(self):
+        entry_dir = self.get_entry_dir()
+        if not all((entry_dir / '{0}.parquet'.format(name)).exists() for name in self.frame_names):
+            return None
+        return {name: pd.read_parquet(entry_dir / '{0}.parquet'.format(name)) for name in self.frame_names}
+
+    def store(self, frames: dict):
+        entry_dir = self.get_entry_dir()
+        entry_dir.mkdir(parents=True, exist_ok=True)
+        for name in self.frame_names:
+            # write under a temporary name first so a concurrent reader never sees a partial file
+            tmp_path = entry_dir / '{0}.parquet.tmp'.format(name)
+            frames[name].to_parquet(tmp_path)
+            os.replace(tmp_path, entry_dir / '{0}.parquet'.format(name))
+
+
+def fetch_md_results(md_bundled_jar_location: str, md_file_location: str, cache_dir: str,
+                     last_bday: pd.Timestamp = None, current_positions: bool = True):
+    last_bday = pd.Timestamp.now().normalize() - BDay(1) if last_bday is None else last_bday
+    report_config = {'last_bday': last_bday.isoformat(), 'aggregation': 'INVACCT', 'average_cost_basis': True,
+                     'remove_aggregates': True, 'current_positions': current_positions}
+    cache = MDResultCache(cache_dir, md_file_location, report_config)
+    frames = cache.load()
+    if frames is not None:
+        print("results loaded from cache {0}".format(cache.get_entry_dir()))
+        return frames
+    print("no cached results for this book and config, running the report...")
+    md_fetcher = MDFetcher(md_bundled_jar_location=md_bundled_jar_location, md_file_location=md_file_location)
+    frames = md_fetcher.run_reports(last_bday, current_positions)
+    md_fetcher.close_md_file()
+    cache.store(frames)
+    return frames
+
+
+def main():
+    try:
+        md_folder = sys.argv[1] if len(sys.argv) > 1 else \
+            str(Path(MODULE_DIRECTORY, 'resources/testMD02.moneydance').absolute())
+        moneydance_jar_path = str(Path(MODULE_DIRECTORY, './lib/invextension_bundled.jar').absolute())
+        cache_dir = str(Path(MODULE_DIRECTORY, '.mdcache').absolute())
+        frames = fetch_md_results(moneydance_jar_path, md_folder, cache_dir)
+        print("Here are net positions...")
+        print(frames['net_positions'])
+        print("and latest prices...")
+        print(frames['latest_currency_prices'])
+    except Exception as ex:
+        print("Exception in user code:")
+        print('-' * 60)
+        print(str(ex))
+        traceback.print_exc(file=sys.stdout)
+        print('-' * 60)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+"""Change tracking for incremental refresh of extracted MDFetcher frames
+
+A ChangeTracker registers transaction, account and currency listeners on an AccountBook and
+collects what changed, so cached frames can be patched instead of re-extracted from scratch.
+"""
+import re
+import threading
+import jpype
+
+# listener callbacks are dispatched on the method name, e.g. txnAdded, txnsModified, accountDeleted,
+# currencyTableModified, so the tracker follows the model API without hard-coding every signature
+CHANGE_METHOD = re.compile(r'(Added|Modified|Removed|Deleted|Changed)$')
+REMOVAL_METHOD = re.compile(r'(Removed|Deleted)$')
+
+
+class ListenerDispatch(object):
+    def __init__(self, callback):
+        self._callback = callback
+
+    def __getattr__(self, name):
+        if not CHANGE_METHOD.search(name):
+            raise AttributeError(name)
+        return lambda *args: self._callback(name, args)
+
+
+def iter_listener_items(args):
+    # listener arguments may be single items, java collections or arrays
+    for arg in args:
+        if arg is None:
+            continue
+        if isinstance(arg, (jpype.JArray, list, tuple)) or hasattr(arg, 'iterator'):
+            yield from arg
+        else:
+            yield arg
+
+
+class ChangeTracker(object):
+    _lock: threading.Lock = None
+    _changed_parents: dict = None
+    _removed_parent_ids: set = None
+    _modified_account_ids: set = None
+    _deleted_account_ids: set = None
+    _changed_currencies: dict = None
+    _all_currencies_changed: bool = False
+    _listeners: list = None
+    _txn_class = None
+    _parent_txn_class = None
+    _account_class = None
+    _currency_class = None
+
+    def __init__(self, account_book):
+        from com.infinitekind.moneydance.model import AbstractTxn
+        from com.infinitekind.moneydance.model import ParentTxn
+        from com.infinitekind.moneydance.model import Account
+        from com.infinitekind.moneydance.model import CurrencyType
+        self._txn_class, self._parent_txn_class = AbstractTxn, ParentTxn
+        self._account_class, self._currency_class = Account, CurrencyType
+        self._lock = threading.Lock()
+        self.clear()
+        self._listeners = [
+            jpype.JProxy('com.infinitekind.moneydance.model.TxnListener', inst=ListenerDispatch(self.on_txns)),
+            jpype.JProxy('com.infinitekind.moneydance.model.AccountListener',
+                         inst=ListenerDispatch(self.on_accounts)),
+            jpype.JProxy('com.infinitekind.moneydance.model.CurrencyListener',
+                         inst=ListenerDispatch(self.on_currencies))]
+        account_book.getTransactionSet().addTxnListener(self._listeners[0])
+        account_book.addAccountListener(self._listeners[1])
+        account_book.getCurrencies().addCurrencyListener(self._listeners[2])
+
+    def clear(self):
+        self._changed_parents = {}
+        self._removed_parent_ids = set()
+        self._modified_account_ids = set()
+        self._deleted_account_ids = set()
+        self._changed_currencies = {}
+        self._all_currencies_changed = False
+
+    def on_txns(self, method_name: str, args):
+        with self._lock:
+            for txn in iter_listener_items(args):
+                if not isinstance(txn, self._txn_class):
+                    continue
+                # a change to any split changes the whole parent, so parents are the unit of patching
+                parent = txn.getParentTxn()
+                parent_id = str(parent.getUUID())
+                is_parent = isinstance(txn, self._parent_txn_class)
+                if REMOVAL_METHOD.search(method_name) and is_parent:
+                    self._changed_parents.pop(parent_id, None)
+                    self._removed_parent_ids.add(parent_id)
+                elif parent_id in self._removed_parent_ids and not (is_parent and method_name.endswith('Added')):
+                    # split or modify events can arrive after their parent's removal; the parent stays removed
+                    continue
+                else:
+                    self._removed_parent_ids.discard(parent_id)
+                    self._changed_parents[parent_id] = parent
+
+    def on_accounts(self, method_name: str, args):
+        with self._lock:
+            accounts = [item for item in iter_listener_items(args) if isinstance(item, self._account_class)]
+            if REMOVAL_METHOD.search(method_name) and accounts:
+                # (parent, account) callbacks name the removed account last
+                self._deleted_account_ids.add(str(accounts[-1].getUUID()))
+            else:
+                self._modified_account_ids.update(str(account.getUUID()) for account in accounts)
+
+    def on_currencies(self, method_name: str, args):
+        currencies = [item for item in iter_listener_items(args) if isinstance(item, self._currency_class)]
+        with self._lock:
+            if currencies:
+                self._changed_currencies.update((str(currency.getUUID()), currency) for currency in currencies)
+            else:
+                self._all_currencies_changed = True
+
+    def mark_currency(self, currency):
+        with self._lock:
+            self._changed_currencies[str(currency.getUUID())] = currency
+
+    def has_changes(self) -> bool:
+        with self._lock:
+            return bool(self._changed_parents or self._removed_parent_ids or self._modified_account_ids or
+                        self._deleted_account_ids or self._changed_currencies or self._all_currencies_changed)
+
+    def pop_changes(self) -> dict:
+        # hands the accumulated changes to the caller and starts a fresh change set
+        with self._lock:
+            changes = {'changed_parents': self._changed_parents, 'removed_parent_ids': self._removed_parent_ids,
+                       'modified_account_ids': self._modified_account_ids,
+                       'deleted_account_ids': self._deleted_account_ids,
+                       'changed_currencies': self._changed_currencies,
+                       'all_currencies_changed': self._all_currencies_changed}
+            self.clear()
+        return changes
+
+    def close(self, account_book):
+        account_book.getTransactionSet().removeTxnListener(self._listeners[0])
+        account_book.removeAccountListener(self._listeners[1])
+        account_book.getCurrencies().removeCurrencyListener(self._listeners[2])
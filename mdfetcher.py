@@ -8,13 +8,19 @@ import os
 import traceback
 from random import randint
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
 from pathlib import Path
 import pandas as pd
 from pandas.tseries.offsets import BDay
 from pandas.tseries.offsets import DateOffset
 import re
+from array import array
+import numpy as np
 #
 import jpype.imports
+import mdjvm
+from mdstats import instrumented
 #
 pd.set_option('display.max_columns', 500)
 pd.set_option('display.max_rows', 500)
@@ -23,10 +29,143 @@ pd.set_option('display.max_colwidth', 200)
 pd.options.display.float_format = '{:,.2f}'.format
 
 MODULE_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+NO_TICKER = 'NoTicker'  # what BulkSecInfo.ListAllCurrenciesInfo() reports for a blank ticker
+
+
+def get_ticker(currency) -> str:
+    ticker = str(currency.getTickerSymbol()).strip()
+    return ticker if ticker else NO_TICKER
+
+
+def walk_accounts(account):
+    # depth-first over the whole account tree, including categories and security sub-accounts
+    yield account
+    for sub_account in account.getSubAccounts():
+        yield from walk_accounts(sub_account)
+
+
+class TxnColumns(object):
+    """Typed column buffers for ParentTxn/SplitTxn rows, filled in a single pass
+
+    value is in the account currency's smallest unit: cents for bank accounts, but a share quantity
+    for security accounts (usually 4 decimals), so decimals holds each row's account decimal places
+    and value / 10 ** decimals is the amount in units.
+    """
+    columns = ['id', 'parent_id', 'is_parent', 'account_id', 'date', 'value', 'decimals', 'status', 'description']
+
+    def __init__(self, account_decimals: dict = None):
+        # account_decimals caches decimal places by account id and can be shared between buffers
+        self.account_decimals = account_decimals if account_decimals is not None else {}
+        self.ids = []
+        self.parent_ids = []
+        self.is_parent = array('b')
+        self.account_ids = []
+        self.dates = array('q')
+        self.values = array('q')
+        self.decimals = array('b')
+        self.statuses = array('b')
+        self.descriptions = []
+
+    def __len__(self):
+        return len(self.ids)
+
+    def append(self, txn, account_id: str, is_parent: bool):
+        txn_id = str(txn.getUUID())
+        self.ids.append(txn_id)
+        self.parent_ids.append(txn_id if is_parent else str(txn.getParentTxn().getUUID()))
+        self.is_parent.append(is_parent)
+        self.account_ids.append(account_id)
+        self.dates.append(txn.getDateInt())
+        self.values.append(txn.getValue())
+        decimals = self.account_decimals.get(account_id)
+        if decimals is None:
+            decimals = self.account_decimals[account_id] = int(txn.getAccount().getCurrencyType().getDecimalPlaces())
+        self.decimals.append(decimals)
+        self.statuses.append(txn.getStatus())
+        self.descriptions.append(str(txn.getDescription()))
+
+    def append_with_splits(self, parent_txn, keep=None):
+        # keep(txn, account_id, is_parent) can drop rows, as the filters of an extraction would
+        for txn, is_parent in [(parent_txn, True)] + [(parent_txn.getSplit(i), False)
+                                                       for i in range(parent_txn.getSplitCount())]:
+            account_id = str(txn.getAccount().getUUID())
+            if keep is None or keep(txn, account_id, is_parent):
+                self.append(txn, account_id, is_parent)
+
+    def to_frame(self) -> pd.DataFrame:
+        # string columns get an explicit dtype, so an empty buffer has the same schema as a full one
+        return pd.DataFrame(OrderedDict([
+            ('id', pd.Series(self.ids, dtype=str)),
+            ('parent_id', pd.Series(self.parent_ids, dtype=str)),
+            ('is_parent', np.frombuffer(self.is_parent, dtype=np.int8).astype(bool)),
+            ('account_id', pd.Series(self.account_ids, dtype=str)),
+            ('date', np.frombuffer(self.dates, dtype=np.int64)),
+            ('value', np.frombuffer(self.values, dtype=np.int64)),
+            ('decimals', np.frombuffer(self.decimals, dtype=np.int8)),
+            ('status', np.frombuffer(self.statuses, dtype=np.int8)),
+            ('description', pd.Series(self.descriptions, dtype=str))]), columns=self.columns)
+
+
+class ReportTableConverter(object):
+    """Converts investment report tables to typed DataFrames, classifying each Java cell class only once"""
+    _name_classes: tuple = None
+    _metric_class = None
+    _kinds: dict = None
+
+    def __init__(self):
+        from com.moneydance.modules.features.invextension import InvestmentAccountWrapper
+        from com.moneydance.modules.features.invextension import SecurityAccountWrapper
+        from com.moneydance.modules.features.invextension import SecurityTypeWrapper
+        from com.moneydance.modules.features.invextension import SecuritySubTypeWrapper
+        from com.moneydance.modules.features.invextension import CurrencyWrapper
+        from com.moneydance.modules.features.invextension.SecurityReport import MetricEntry
+        self._name_classes = (InvestmentAccountWrapper, SecurityAccountWrapper, SecurityTypeWrapper,
+                              SecuritySubTypeWrapper, CurrencyWrapper)
+        self._metric_class = MetricEntry
+        self._kinds = {type(None): None}
+
+    def get_kind(self, cell):
+        cell_class = type(cell)
+        if cell_class not in self._kinds:
+            self._kinds[cell_class] = 'name' if isinstance(cell, self._name_classes) else \
+                'metric' if isinstance(cell, self._metric_class) else None
+        return self._kinds[cell_class]
+
+    def convert_column(self, cells):
+        column_kind = next((kind for kind in map(self.get_kind, cells) if kind is not None), None)
+        if column_kind == 'metric':
+            values = np.full(len(cells), np.nan)
+            for i, cell in enumerate(cells):
+                if self.get_kind(cell) == 'metric':
+                    values[i] = cell.getDisplayValue()
+            values[values >= sys.float_info.max] = np.nan
+            return values
+        if column_kind == 'name':
+            return [str(cell.getName()) if self.get_kind(cell) == 'name' else None for cell in cells]
+        return [None] * len(cells)
+
+    def to_frame(self, header: list, rows) -> pd.DataFrame:
+        # one pass to pull the rows across, then each column is converted as a whole
+        columns = list(zip(*[list(row) for row in rows])) or [()] * len(header)
+        return pd.DataFrame(OrderedDict((name, self.convert_column(cells)) for name, cells in zip(header, columns)),
+                            columns=header)
+
+
+class ReportSpec(NamedTuple):
+    report: str = 'snapshot'  # or 'from_to'
+    aggregation: str = 'INVACCT'
+    last_bday: pd.Timestamp = None
+    first_date: pd.Timestamp = None
+    remove_aggregates: bool = True
 
 
 class MDFetcher(object):
     valid_ticker_match=r"^(NoTicker|.+NDQ|CASH)$"
+    report_names = ['snapshot_report', 'net_positions', 'all_currency_data', 'latest_currency_prices']
+    # QIF cleared flags and plain names for AbstractTxn status bytes
+    txn_status_names = {'': 'STATUS_UNRECONCILED', 'unreconciled': 'STATUS_UNRECONCILED',
+                        '*': 'STATUS_RECONCILING', 'c': 'STATUS_RECONCILING', 'reconciling': 'STATUS_RECONCILING',
+                        'X': 'STATUS_CLEARED', 'R': 'STATUS_CLEARED', 'cleared': 'STATUS_CLEARED'}
     _md_bundled_jar_location: str = None
     _md_file_location: str = None
     _wrapper = None
@@ -34,10 +173,18 @@ class MDFetcher(object):
     _rootAccount = None
     _reportConfig = None
     _bulkSecInfo = None
+    _reportConverter = None
     _snapshotReport: pd.DataFrame = None
+    _fromToReport: pd.DataFrame = None
+    _reportExecutor: ThreadPoolExecutor = None
     _netPositions: pd.DataFrame = None
     _all_currencies_data: pd.DataFrame = None
     _latest_currency_prices: pd.DataFrame = None
+    _transactions: pd.DataFrame = None
+    _transaction_filters: dict = None
+    _currency_filters: dict = None
+    _latest_prices_options: dict = None
+    _changeTracker = None
 
     def __init__(self, md_bundled_jar_location: str,  md_file_location: str):
         self._md_bundled_jar_location = md_bundled_jar_location
@@ -45,9 +192,12 @@ class MDFetcher(object):
         self.init_md_jar()
         self.load_md_file()
 
+    @instrumented()
     def init_md_jar(self):
-        jpype.startJVM(classpath=[str(Path(self._md_bundled_jar_location).absolute())])
+        # the JVM is shared by every MDFetcher (and pyaccountwrapper) in the process, so many books can be open
+        mdjvm.ensure_jvm(self._md_bundled_jar_location)
 
+    @instrumented()
     def load_md_file(self):
         if Path(self._md_file_location).absolute().exists():
             from java.io import File
@@ -63,72 +213,143 @@ class MDFetcher(object):
             self._accountBook = self._wrapper.getBook()
             self._root_account = self._accountBook.getRootAccount()
 
+    @instrumented()
     def close_md_file(self):
+        if self._changeTracker is not None:
+            self._changeTracker.close(self._accountBook)
+            self._changeTracker = None
+        if self._reportExecutor is not None:
+            self._reportExecutor.shutdown(wait=True)
+            self._reportExecutor = None
         self._accountBook.cleanUp()
         self._accountBook = None
         self._wrapper = None
         self._root_account = None
         self._reportConfig = None
         self._bulkSecInfo = None
+        self._reportConverter = None
+        self._transactions = None
+        self._transaction_filters = None
+        self._currency_filters = None
+        self._latest_prices_options = None
         print("Moneydance file closed...")
 
-    def load_BulkSecInfo(self, last_bday: pd.Timestamp = pd.Timestamp.now().normalize() - BDay(1)):
-        print("fetching Bulk Security Info...")
+    def get_account_book(self):
+        return self._accountBook
+
+    @instrumented()
+    def make_report_config(self, last_bday: pd.Timestamp, aggregation: str = 'INVACCT',
+                           first_date: pd.Timestamp = None):
+        # aggregation is an AggregationController name (INVACCT, TICKER, SECTYPE); the from-date defaults to
+        # the business day on or before one year prior to last_bday
         from com.moneydance.modules.features.invextension import ReportConfig
         from com.moneydance.modules.features.invextension import AggregationController  # enum INVACCT, TICKER, SECTYPE
-        from com.moneydance.modules.features.invextension import BulkSecInfo
         from com.moneydance.modules.features.invextension import DateRange
-        year_ago_dt = last_bday - DateOffset(months=12) if BDay().is_on_offset(last_bday - DateOffset(months=12)) \
-            else last_bday - DateOffset(months=12) - BDay(1)
-        self._reportConfig = ReportConfig.getTestReportConfig(self._root_account, False, AggregationController.INVACCT)
+        if first_date is None:
+            first_date = last_bday - DateOffset(months=12) if BDay().is_on_offset(last_bday - DateOffset(months=12)) \
+                else last_bday - DateOffset(months=12) - BDay(1)
+        reportConfig = ReportConfig.getTestReportConfig(self._root_account, False,
+                                                        getattr(AggregationController, aggregation))
         dateInt_format = '%Y%m%d'
-        dateRange = DateRange(int(year_ago_dt.strftime(dateInt_format)), int(last_bday.strftime(dateInt_format)),
+        dateRange = DateRange(int(first_date.strftime(dateInt_format)), int(last_bday.strftime(dateInt_format)),
                               int(last_bday.strftime(dateInt_format)))
-        self._reportConfig.setUseAverageCostBasis(True)
-        self._reportConfig.setOutputSingle(True)
-        self._reportConfig.setDateRange(dateRange)
-        self._bulkSecInfo = BulkSecInfo(self._accountBook, self._reportConfig)
+        reportConfig.setUseAverageCostBasis(True)
+        reportConfig.setOutputSingle(True)
+        reportConfig.setDateRange(dateRange)
+        return reportConfig
 
-    def calc_snap_report(self, remove_aggregates=True):
-        print("Fetching snapshot report...")
+    @instrumented()
+    def load_BulkSecInfo(self, last_bday: pd.Timestamp = None):
+        # the default is taken per call, so a long-running process moves forward with the calendar
+        print("fetching Bulk Security Info...")
+        last_bday = last_bday if last_bday is not None else pd.Timestamp.now().normalize() - BDay(1)
         from com.moneydance.modules.features.invextension import BulkSecInfo
-        from com.moneydance.modules.features.invextension import TotalSnapshotReport
-        from com.moneydance.modules.features.invextension import InvestmentAccountWrapper
-        from com.moneydance.modules.features.invextension import SecurityAccountWrapper
-        from com.moneydance.modules.features.invextension import SecurityTypeWrapper
-        from com.moneydance.modules.features.invextension import SecuritySubTypeWrapper
-        from com.moneydance.modules.features.invextension import CurrencyWrapper
-        from com.moneydance.modules.features.invextension.SecurityReport import MetricEntry
+        self._reportConfig = self.make_report_config(last_bday)
+        self._bulkSecInfo = BulkSecInfo(self._accountBook, self._reportConfig)
+
+    def get_report_converter(self):
+        if self._reportConverter is None:
+            self._reportConverter = ReportTableConverter()
+        return self._reportConverter
 
-        def get_display_val(obj):
-            if any([isinstance(obj, InvestmentAccountWrapper),
-                    isinstance(obj, SecurityAccountWrapper),
-                    isinstance(obj, SecurityTypeWrapper),
-                    isinstance(obj, SecuritySubTypeWrapper),
-                    isinstance(obj, CurrencyWrapper)]):
-                return str(obj.getName())
-            elif isinstance(obj, MetricEntry):
-                return obj.getDisplayValue() if obj.getDisplayValue() < sys.float_info.max else float('nan')
-            else:
-                return None
-        snapshotReport = TotalSnapshotReport(self._reportConfig, self._bulkSecInfo)
-        snapshotReport.calcReport()
-        snapObj = snapshotReport.getReportTable()
-        header = [str(col) for col in snapshotReport.getModelHeader()]
-        header = [col.replace('\n', ' ') for col in header]
+    @instrumented()
+    def calc_report_frame(self, report, remove_aggregates=True) -> pd.DataFrame:
+        # works for any investment report with calcReport/getModelHeader/getReportTable
+        report.calcReport()
+        header = [str(col).replace('\n', ' ') for col in report.getModelHeader()]
         print("here's the header...")
         print(header)
-        all_data = []
-        for row in snapObj:
-            row_data = {}
-            for i, ele in enumerate(row):
-                row_data[header[i]] = get_display_val(ele)
-            all_data.append(row_data)
-        self._snapshotReport = pd.DataFrame(all_data)
+        report_frame = self.get_report_converter().to_frame(header, report.getReportTable())
         if remove_aggregates:
-            self._snapshotReport = self._snapshotReport[self._snapshotReport['SecType'].str.len() > 0]
-        print("Snapshot report fetched with {0:d} total rows...")
+            report_frame = report_frame[report_frame['SecType'].str.len() > 0]
+        return report_frame
+
+    @instrumented('_snapshotReport')
+    def calc_snap_report(self, remove_aggregates=True):
+        print("Fetching snapshot report...")
+        from com.moneydance.modules.features.invextension import TotalSnapshotReport
+        self._snapshotReport = self.calc_report_frame(TotalSnapshotReport(self._reportConfig, self._bulkSecInfo),
+                                                      remove_aggregates)
+        print("Snapshot report fetched with {0:d} total rows...".format(len(self._snapshotReport)))
 
+    @instrumented('_fromToReport')
+    def calc_from_to_report(self, remove_aggregates=True):
+        print("Fetching from-to report...")
+        from com.moneydance.modules.features.invextension import TotalFromToReport
+        self._fromToReport = self.calc_report_frame(TotalFromToReport(self._reportConfig, self._bulkSecInfo),
+                                                    remove_aggregates)
+        print("From-to report fetched with {0:d} total rows...".format(len(self._fromToReport)))
+
+    def get_from_to_report(self):
+        return self._fromToReport
+
+    @instrumented()
+    def calc_report_for_spec(self, spec: ReportSpec) -> pd.DataFrame:
+        from com.moneydance.modules.features.invextension import TotalSnapshotReport
+        from com.moneydance.modules.features.invextension import TotalFromToReport
+        report_classes = {'snapshot': TotalSnapshotReport, 'from_to': TotalFromToReport}
+        if spec.report not in report_classes:
+            raise ValueError("unknown report type {0}".format(spec.report))
+        last_bday = spec.last_bday if spec.last_bday is not None else pd.Timestamp.now().normalize() - BDay(1)
+        reportConfig = self.make_report_config(last_bday, spec.aggregation, spec.first_date)
+        return self.calc_report_frame(report_classes[spec.report](reportConfig, self._bulkSecInfo),
+                                      spec.remove_aggregates)
+
+    @instrumented()
+    def submit_reports(self, specs: list, max_workers: int = None) -> list:
+        # each report gets its own ReportConfig on a pool thread, sharing the book and BulkSecInfo read-only;
+        # JPype releases the GIL inside calcReport, so the reports run concurrently
+        if self._bulkSecInfo is None:
+            self.load_BulkSecInfo()
+        if self._reportExecutor is None:
+            self._reportExecutor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='md-report')
+        return [self._reportExecutor.submit(self.calc_report_for_spec, spec) for spec in specs]
+
+    @instrumented()
+    def calc_report_panel(self, period_ends: list = None, start: pd.Timestamp = None, end: pd.Timestamp = None,
+                          offset: DateOffset = pd.offsets.BMonthEnd(), report: str = 'snapshot',
+                          aggregation: str = 'INVACCT', max_workers: int = None) -> pd.DataFrame:
+        # period ends are given directly, or generated from start to end by offset (BMonthEnd, BQuarterEnd,
+        # BYearEnd...); BulkSecInfo is built once and every period's report reuses it. From-to reports cover
+        # each period since the previous period end, snapshot reports use their usual trailing windows.
+        if period_ends is None:
+            period_ends = list(pd.date_range(pd.Timestamp(start), pd.Timestamp(end), freq=offset))
+        period_ends = sorted(BDay().rollback(pd.Timestamp(period_end)) for period_end in period_ends)
+        if not period_ends:
+            raise ValueError("no period ends in the requested grid")
+        if self._bulkSecInfo is None:
+            self.load_BulkSecInfo(period_ends[-1])
+        first_dates = [None] + period_ends[:-1] if report == 'from_to' else [None] * len(period_ends)
+        specs = [ReportSpec(report, aggregation, period_end, first_date)
+                 for period_end, first_date in zip(period_ends, first_dates)]
+        futures = self.submit_reports(specs, max_workers)
+        return pd.concat([future.result() for future in futures], keys=period_ends, names=['Period End', None])\
+            .reset_index(level=0).reset_index(drop=True)
+
+    def get_snapshot_report(self):
+        return self._snapshotReport
+
+    @instrumented('_netPositions')
     def derive_net_positions(self):
         df = self._snapshotReport[self._snapshotReport['End Pos'] > 0.].copy()
         agg_cols = OrderedDict(
@@ -141,36 +362,382 @@ class MDFetcher(object):
     def get_net_positions(self):
         return self._netPositions
 
-    def extract_all_currency_data(self):
-        from com.moneydance.modules.features.invextension import BulkSecInfo
-        currency_data_py = []
-        currencies_info_java = [x for x in self._bulkSecInfo.ListAllCurrenciesInfo()]
-        for currency_info in currencies_info_java:
-            currency_data_py.append(list(ele.strip(" '[]") for ele in str(currency_info).split(',')))
-        header = [x.strip() for x in str(BulkSecInfo.listCurrencySnapshotHeader()).split(',')]
-        self._all_currencies_data = pd.DataFrame(data=currency_data_py, columns=header)
-        self._all_currencies_data['Date'] = self._all_currencies_data['Date'].astype('datetime64[ns]')
-        for item in ['PricebyDate', 'PriceByDate(Adjust)']:
-            self._all_currencies_data[item] = self._all_currencies_data[item].astype('float')
-
-    def filter_latest_currency_prices(self, current_positions=True):
-        valid_call = (self._all_currencies_data is not None) and \
-                     (self._netPositions is not None if current_positions else True)
-        if valid_call:
-            all_tickers = [x for x in self._all_currencies_data['Ticker'].unique() if
-                           not re.match(self.valid_ticker_match, x)]
-            current_tickers = [x for x in self._netPositions.index.unique() if
-                           not re.match(self.valid_ticker_match, x)]
-            self._all_currencies_data.sort_values(by=['Ticker', 'Date'], inplace=True)
-            self._latest_currency_prices: pd.DataFrame = self._all_currencies_data[self._all_currencies_data['Ticker']
-                .isin(current_tickers if current_positions else all_tickers)] \
-                .loc[:, ['id', 'Name', 'Ticker', 'Date', 'PricebyDate']]\
-                .pivot_table(index=['id', 'Name', 'Ticker'], aggfunc='last')
-            self._latest_currency_prices.reset_index(inplace=True)
-            self._latest_currency_prices.set_index(keys='Ticker', inplace=True)
-            self._latest_currency_prices.sort_index(inplace=True)
-        else:
+    def make_currency_filter(self, tickers: list = None, currency_ids: list = None, currency_types: list = None,
+                             account_ids: list = None, exclude_ticker_match: str = None):
+        # a predicate on CurrencyTypes: tickers, UUIDs, types (SECURITY, CURRENCY), the currencies of the given
+        # accounts and their sub-accounts, and tickers not matching a regex
+        tickers = set(tickers) if tickers is not None else None
+        currency_ids = set(currency_ids) if currency_ids is not None else None
+        currency_types = set(currency_types) if currency_types is not None else None
+        if account_ids is not None:
+            account_index = self.get_account_index()
+            account_currency_ids = set()
+            for account_id in account_ids:
+                account = account_index.get_by_uuid(account_id)
+                if account is None:
+                    raise ValueError("unknown account {0}".format(account_id))
+                account_currency_ids.update(str(sub_account.getCurrencyType().getUUID())
+                                            for sub_account in walk_accounts(account))
+            currency_ids = account_currency_ids if currency_ids is None else currency_ids & account_currency_ids
+        exclude_ticker_match = re.compile(exclude_ticker_match) if exclude_ticker_match is not None else None
+
+        def keep(currency) -> bool:
+            if currency_types is not None and str(currency.getCurrencyType()) not in currency_types:
+                return False
+            if currency_ids is not None and str(currency.getUUID()) not in currency_ids:
+                return False
+            if tickers is not None or exclude_ticker_match is not None:
+                ticker = get_ticker(currency)
+                if (tickers is not None and ticker not in tickers) or \
+                        (exclude_ticker_match is not None and exclude_ticker_match.match(ticker)):
+                    return False
+            return True
+        return keep
+
+    def iter_currencies(self, tickers: list = None, currency_ids: list = None, currency_types: list = None,
+                        account_ids: list = None, exclude_ticker_match: str = None):
+        # filters CurrencyTypes before any snapshot is read; see make_currency_filter()
+        keep = self.make_currency_filter(tickers, currency_ids, currency_types, account_ids, exclude_ticker_match)
+        for currency in self._accountBook.getCurrencies().getAllCurrencies():
+            if keep(currency):
+                yield currency
+
+    @instrumented()
+    def extract_currency_frame(self, currencies, start_date: int = None, end_date: int = None,
+                               latest_only: bool = False) -> pd.DataFrame:
+        # read snapshot fields directly into typed columns; layout matches BulkSecInfo.ListAllCurrenciesInfo(),
+        # including NoTicker for a blank ticker, which valid_ticker_match excludes from the latest prices.
+        # Only snapshots in the inclusive dateInt window are converted; with latest_only, just the last one.
+        today_int = int(pd.Timestamp.now().strftime('%Y%m%d'))
+        ids, names, tickers = [], [], []
+        dates, prices, adjusted_prices = array('q'), array('d'), array('d')
+        for currency in currencies:
+            snapshots = currency.getSnapshots()
+            if latest_only:
+                # the snapshot list isn't guaranteed to be in date order (PriceStore sorts it too), so take the
+                # newest date in the window rather than the first hit from the end
+                latest, latest_date_int = None, None
+                for snapshot in snapshots:
+                    date_int = snapshot.getDateInt()
+                    if (start_date is None or date_int >= start_date) and (end_date is None or date_int <= end_date) \
+                            and (latest_date_int is None or date_int > latest_date_int):
+                        latest, latest_date_int = snapshot, date_int
+                snapshots = [latest] if latest is not None else []
+            currency_id, name, ticker = None, None, None
+            has_splits = None
+            for snapshot in snapshots:
+                date_int = snapshot.getDateInt()
+                if (start_date is not None and date_int < start_date) or (end_date is not None and date_int > end_date):
+                    continue
+                if currency_id is None:
+                    # converted once per currency, and only if it has a snapshot to report
+                    currency_id, name, ticker = str(currency.getUUID()), str(currency.getName()), \
+                        get_ticker(currency)
+                    has_splits = not currency.getSplits().isEmpty()
+                rate = snapshot.getRate()
+                ids.append(currency_id)
+                names.append(name)
+                tickers.append(ticker)
+                dates.append(date_int)
+                prices.append(1. / rate)
+                adjusted_prices.append(1. / currency.adjustRateForSplitsInt(date_int, rate, today_int)
+                                       if has_splits else 1. / rate)
+        return pd.DataFrame(OrderedDict([
+            ('id', pd.Series(ids, dtype=str)), ('Name', pd.Series(names, dtype=str)),
+            ('Ticker', pd.Series(tickers, dtype=str)),
+            ('Date', pd.to_datetime(np.frombuffer(dates, dtype=np.int64).astype(str), format='%Y%m%d')),
+            ('PricebyDate', np.frombuffer(prices, dtype=np.float64)),
+            ('PriceByDate(Adjust)', np.frombuffer(adjusted_prices, dtype=np.float64))]))
+
+    @instrumented('_all_currencies_data')
+    def extract_all_currency_data(self, start_date: int = None, end_date: int = None, tickers: list = None,
+                                  currency_types: list = None, account_ids: list = None):
+        # filters are applied while walking the java objects; see iter_currencies() and extract_currency_frame().
+        # They are kept so refresh_extracted() patches the frame with the same filters.
+        self._currency_filters = {'start_date': start_date, 'end_date': end_date, 'tickers': tickers,
+                                  'currency_types': currency_types, 'account_ids': account_ids}
+        self._all_currencies_data = self.extract_currency_frame(
+            self.iter_currencies(tickers, currency_types=currency_types, account_ids=account_ids),
+            start_date, end_date)
+
+    @instrumented('_latest_currency_prices')
+    def filter_latest_currency_prices(self, current_positions=True, end_date: int = None):
+        # reads only the newest snapshot (on or before end_date) of each wanted currency straight from the book
+        if current_positions and self._netPositions is None:
             raise ValueError("call to filter latest currency invalid--check whether precedents are met!")
+        self._latest_prices_options = {'current_positions': current_positions, 'end_date': end_date}
+        tickers = list(self._netPositions.index.unique()) if current_positions else None
+        latest_prices = self.extract_currency_frame(
+            self.iter_currencies(tickers, exclude_ticker_match=self.valid_ticker_match),
+            end_date=end_date, latest_only=True)
+        self._latest_currency_prices: pd.DataFrame = latest_prices.loc[:, ['id', 'Name', 'Ticker', 'Date',
+                                                                            'PricebyDate']]
+        self._latest_currency_prices.set_index(keys='Ticker', inplace=True)
+        self._latest_currency_prices.sort_index(inplace=True)
+
+    @staticmethod
+    def make_txn_filter(start_date: int = None, end_date: int = None, account_ids: list = None,
+                        kinds: list = None):
+        # a predicate keep(txn, account_id, is_parent); dates are inclusive dateInts, account_ids are the UUIDs
+        # of the register accounts, kinds any of 'parent' and 'split'
+        account_ids = set(account_ids) if account_ids is not None else None
+        kinds = set(kinds) if kinds is not None else {'parent', 'split'}
+        if not kinds.issubset({'parent', 'split'}):
+            raise ValueError("unknown transaction kinds {0}".format(', '.join(kinds - {'parent', 'split'})))
+
+        def keep(txn, account_id: str, is_parent: bool) -> bool:
+            if account_ids is not None and account_id not in account_ids:
+                return False
+            if ('parent' if is_parent else 'split') not in kinds:
+                return False
+            if start_date is not None or end_date is not None:
+                date_int = txn.getDateInt()
+                if (start_date is not None and date_int < start_date) or (end_date is not None and date_int > end_date):
+                    return False
+            return True
+        return keep
+
+    def iter_txns(self, start_date: int = None, end_date: int = None, account_ids: list = None, kinds: list = None):
+        # yields (txn, account_id, is_parent) register by register, holding no more than the current txn;
+        # filters are those of make_txn_filter(), and registers of other accounts are skipped unread
+        from com.infinitekind.moneydance.model import ParentTxn
+        txnSet = self._accountBook.getTransactionSet()
+        keep = self.make_txn_filter(start_date, end_date, account_ids, kinds)
+        account_ids = set(account_ids) if account_ids is not None else None
+        for account in walk_accounts(self._root_account):
+            account_id = str(account.getUUID())
+            if account_ids is not None and account_id not in account_ids:
+                continue
+            for txn in txnSet.getTransactionsForAccount(account).iterableTxns():
+                is_parent = isinstance(txn, ParentTxn)
+                if keep(txn, account_id, is_parent):
+                    yield txn, account_id, is_parent
+
+    def iter_transaction_chunks(self, chunk_size: int = 50000, start_date: int = None, end_date: int = None,
+                                account_ids: list = None, kinds: list = None, output: str = 'frame'):
+        # yields chunk_size rows at a time as DataFrames ('frame') or pyarrow RecordBatches ('arrow'), with the
+        # columns of get_transactions(), so exports run in memory bounded by the chunk size, not the book
+        if output not in ('frame', 'arrow'):
+            raise ValueError("unknown chunk output {0}, expected 'frame' or 'arrow'".format(output))
+        if output == 'arrow':
+            import pyarrow as pa
+        txn_columns = TxnColumns()
+        for txn, account_id, is_parent in self.iter_txns(start_date, end_date, account_ids, kinds):
+            txn_columns.append(txn, account_id, is_parent)
+            if len(txn_columns) >= chunk_size:
+                chunk = txn_columns.to_frame()
+                yield chunk if output == 'frame' else pa.RecordBatch.from_pandas(chunk, preserve_index=False)
+                txn_columns = TxnColumns(txn_columns.account_decimals)
+        if len(txn_columns) > 0:
+            chunk = txn_columns.to_frame()
+            yield chunk if output == 'frame' else pa.RecordBatch.from_pandas(chunk, preserve_index=False)
+
+    @instrumented(lambda row_count: row_count)
+    def export_transactions(self, path: str, chunk_size: int = 50000, **filters) -> int:
+        # streams transactions to a Parquet file chunk by chunk; filters are those of iter_txns()
+        import pyarrow.parquet as pq
+        writer, row_count = None, 0
+        try:
+            for batch in self.iter_transaction_chunks(chunk_size, output='arrow', **filters):
+                if writer is None:
+                    writer = pq.ParquetWriter(path, batch.schema)
+                writer.write_batch(batch)
+                row_count += batch.num_rows
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is None:
+            TxnColumns().to_frame().to_parquet(path, index=False)
+        print("exported {0:d} transactions to {1}".format(row_count, path))
+        return row_count
+
+    @instrumented('_transactions')
+    def extract_transactions(self, start_date: int = None, end_date: int = None, account_ids: list = None,
+                             kinds: list = None):
+        # walk the account tree and pull each account's register, so the account id is converted once per
+        # account rather than once per transaction; every txn belongs to exactly one account register.
+        # Filters are those of iter_txns(), applied before a txn's fields are read.
+        print("extracting transactions...")
+        self._transaction_filters = {'start_date': start_date, 'end_date': end_date, 'account_ids': account_ids,
+                                     'kinds': kinds}
+        txn_columns = TxnColumns()
+        for txn, account_id, is_parent in self.iter_txns(start_date, end_date, account_ids, kinds):
+            txn_columns.append(txn, account_id, is_parent)
+        self._transactions = txn_columns.to_frame()
+        print("extracted {0:d} transactions...".format(len(self._transactions)))
+
+    def get_transactions(self):
+        return self._transactions
+
+    @instrumented()
+    def enable_incremental(self):
+        # from here on, book changes are recorded so refresh_extracted() can patch the extracted frames
+        from mdchanges import ChangeTracker
+        if self._changeTracker is None:
+            self._changeTracker = ChangeTracker(self._accountBook)
+
+    @instrumented()
+    def refresh_extracted(self) -> dict:
+        # patches transactions and currency data in proportion to what changed since the last refresh, with the
+        # filters they were extracted with; latest prices are re-read with their original options. Reports and
+        # net positions depend on the whole book and still need calc_snap_report()/derive_net_positions().
+        if self._changeTracker is None:
+            raise ValueError("incremental refresh needs enable_incremental() before the frames are extracted")
+        changes = self._changeTracker.pop_changes()
+        if self._transactions is not None:
+            stale_parent_ids = set(changes['changed_parents']) | changes['removed_parent_ids']
+            keep = ~self._transactions['parent_id'].isin(stale_parent_ids) & \
+                ~self._transactions['account_id'].isin(changes['deleted_account_ids'])
+            txn_columns = TxnColumns()
+            keep_txn = self.make_txn_filter(**self._transaction_filters)
+            for parent_txn in changes['changed_parents'].values():
+                txn_columns.append_with_splits(parent_txn, keep_txn)
+            self._transactions = pd.concat([self._transactions[keep], txn_columns.to_frame()], ignore_index=True)
+        if self._all_currencies_data is not None:
+            filters = self._currency_filters
+            if changes['all_currencies_changed']:
+                self.extract_all_currency_data(**filters)
+            elif changes['changed_currencies']:
+                # a changed currency that no longer passes the filters is dropped along with its old rows
+                keep_currency = self.make_currency_filter(filters['tickers'], currency_types=filters['currency_types'],
+                                                          account_ids=filters['account_ids'])
+                keep = ~self._all_currencies_data['id'].isin(changes['changed_currencies'].keys())
+                self._all_currencies_data = pd.concat(
+                    [self._all_currencies_data[keep],
+                     self.extract_currency_frame([currency for currency in changes['changed_currencies'].values()
+                                                  if keep_currency(currency)],
+                                                 filters['start_date'], filters['end_date'])], ignore_index=True)
+        if self._latest_currency_prices is not None and \
+                (changes['all_currencies_changed'] or changes['changed_currencies']):
+            self.filter_latest_currency_prices(**self._latest_prices_options)
+        summary = OrderedDict([('transactions', len(changes['changed_parents'])),
+                               ('removed_transactions', len(changes['removed_parent_ids'])),
+                               ('modified_accounts', len(changes['modified_account_ids'])),
+                               ('deleted_accounts', len(changes['deleted_account_ids'])),
+                               ('currencies', 'all' if changes['all_currencies_changed']
+                                else len(changes['changed_currencies']))])
+        print("incremental refresh: {0}".format(', '.join('{0} {1}'.format(k, v) for k, v in summary.items())))
+        return summary
+
+    @instrumented(lambda counts: counts['inserted'] + counts['overwritten'])
+    def update_prices(self, prices: pd.DataFrame) -> dict:
+        # prices has a 'ticker' and/or 'uuid' column plus 'dateInt' and 'price'; every snapshot is applied,
+        # then the book is saved once. Moneydance records changes per item, so each new snapshot is synced.
+        if not {'dateInt', 'price'}.issubset(prices.columns) or \
+                not {'ticker', 'uuid'}.intersection(prices.columns):
+            raise ValueError("prices need 'ticker' or 'uuid' plus 'dateInt' and 'price' columns")
+        currencies_by_key = {}
+        for currency in self._accountBook.getCurrencies().getAllCurrencies():
+            currencies_by_key[str(currency.getUUID())] = currency
+            ticker = str(currency.getTickerSymbol())
+            if ticker:
+                # a blank ticker must not resolve to the first currency without one (usually the base currency)
+                currencies_by_key.setdefault(ticker, currency)
+        keys = prices['uuid'] if 'uuid' in prices.columns else pd.Series(None, index=prices.index, dtype=object)
+        if 'ticker' in prices.columns:
+            keys = keys.where(keys.notna() & (keys.astype(str).str.strip() != ''), prices['ticker'])
+        existing_dates = {}
+        counts = OrderedDict([('inserted', 0), ('overwritten', 0), ('skipped', 0)])
+        for key, date_int, price in zip(keys, prices['dateInt'], prices['price']):
+            currency = currencies_by_key.get(key.strip()) if isinstance(key, str) and key.strip() else None
+            if currency is None or not price > 0.:
+                counts['skipped'] += 1
+                continue
+            currency_id = str(currency.getUUID())
+            if currency_id not in existing_dates:
+                existing_dates[currency_id] = set(int(snapshot.getDateInt()) for snapshot in currency.getSnapshots())
+            date_int = int(date_int)
+            counts['overwritten' if date_int in existing_dates[currency_id] else 'inserted'] += 1
+            existing_dates[currency_id].add(date_int)
+            currency.addSnapshotInt(date_int, 1. / float(price)).syncItem()
+            if self._changeTracker is not None:
+                self._changeTracker.mark_currency(currency)
+        if counts['inserted'] + counts['overwritten'] > 0:
+            print("AccountBook Saved? {0}".format(self._accountBook.save()))
+        print("price update: {0}".format(', '.join('{0} {1:d}'.format(k, v) for k, v in counts.items())))
+        return counts
+
+    @instrumented()
+    def run_reports(self, last_bday: pd.Timestamp = None, current_positions=True) -> dict:
+        # the standard pipeline: BulkSecInfo, snapshot report, net positions, currency data and latest prices
+        last_bday = last_bday if last_bday is not None else pd.Timestamp.now().normalize() - BDay(1)
+        self.load_BulkSecInfo(last_bday)
+        self.calc_snap_report()
+        self.derive_net_positions()
+        self.extract_all_currency_data()
+        self.filter_latest_currency_prices(current_positions)
+        return OrderedDict(zip(self.report_names, [self.get_snapshot_report(), self.get_net_positions(),
+                                                   self.get_all_currency_data(), self.get_latest_currency_prices()]))
+
+    @instrumented(len)
+    def get_account_index(self):
+        # UUID, full name ('Food:Groceries'), plain name and type to account, built in one pass over the tree
+        from accountindex import AccountIndex
+        return AccountIndex(self._root_account)
+
+    @instrumented(lambda parent_count: parent_count)
+    def insert_transactions(self, transactions: pd.DataFrame, save: bool = True) -> int:
+        # one row per split: date (dateInt), account, category (names or UUIDs), amount (int cents, as the change
+        # in 'account'), optional description, memo, split_memo, status, check_number, and 'txn' to group several
+        # splits under one parent; parent fields are taken from the first row of each group
+        from com.infinitekind.moneydance.model import AbstractTxn
+        from com.infinitekind.moneydance.model import ParentTxn
+        from com.infinitekind.moneydance.model import SplitTxn
+        required = ['date', 'account', 'category', 'amount']
+        if not set(required).issubset(transactions.columns):
+            raise ValueError("transactions need 'date', 'account', 'category' and 'amount' columns")
+        incomplete = [name for name in required if transactions[name].isna().any()]
+        if incomplete:
+            raise ValueError("missing values in required columns: {0}".format(', '.join(incomplete)))
+        accounts = self.get_account_index()
+        account_names = pd.unique(pd.concat([transactions['account'], transactions['category']]).astype(str))
+        missing = [name for name in account_names if name not in accounts]
+        if missing:
+            raise ValueError("unknown accounts or categories: {0}".format(', '.join(missing)))
+        statuses = {key: getattr(AbstractTxn, name) for key, name in self.txn_status_names.items()}
+
+        def column(name, default=''):
+            if name not in transactions.columns:
+                return [default] * len(transactions)
+            values = transactions[name].astype(object)
+            return values.where(values.notna(), default).tolist()
+        group_codes = pd.factorize(transactions['txn'])[0] if 'txn' in transactions.columns \
+            else np.arange(len(transactions))
+        # factorize codes every missing 'txn' as -1; each of those rows is its own transaction
+        ungrouped = group_codes < 0
+        group_codes[ungrouped] = group_codes.max(initial=-1) + 1 + np.arange(ungrouped.sum())
+        dates, amounts = column('date', 0), column('amount', 0)
+        account_keys, category_keys = column('account'), column('category')
+        descriptions, memos, status_keys = column('description'), column('memo'), column('status')
+        check_numbers = column('check_number')
+        split_memos = column('split_memo', None)
+        ptxn, parent_count, last_code = None, 0, None
+        for i in np.argsort(group_codes, kind='stable'):
+            if group_codes[i] != last_code:
+                if ptxn is not None:
+                    ptxn.syncItem()
+                ptxn = ParentTxn(self._accountBook)
+                ptxn.setDateInt(int(dates[i]))
+                ptxn.setTaxDateInt(int(dates[i]))
+                ptxn.setAccount(accounts[str(account_keys[i])])
+                ptxn.setDescription(str(descriptions[i]))
+                ptxn.setMemo(str(memos[i]))
+                if check_numbers[i]:
+                    ptxn.setCheckNumber(str(check_numbers[i]))
+                ptxn.setStatus(statuses.get(str(status_keys[i]).strip(), AbstractTxn.STATUS_UNRECONCILED))
+                parent_count, last_code = parent_count + 1, group_codes[i]
+            amount = int(amounts[i])
+            split = SplitTxn(ptxn)
+            split.setAccount(accounts[str(category_keys[i])])
+            split.setAmount(-amount, 0.0, amount)
+            split.setDescription(str(split_memos[i] if split_memos[i] is not None else memos[i]))
+            ptxn.addSplit(split)
+        if ptxn is not None:
+            ptxn.syncItem()
+        if save and parent_count > 0:
+            print("AccountBook Saved? {0}".format(self._accountBook.save()))
+        print("inserted {0:d} transactions from {1:d} rows...".format(parent_count, len(transactions)))
+        return parent_count
 
     def get_all_currency_data(self):
         return self._all_currencies_data
@@ -194,6 +761,9 @@ def main():
         print("filter last prices...")
         md_fetcher.filter_latest_currency_prices()
         print(md_fetcher.get_latest_currency_prices())
+        print("extract transactions...")
+        md_fetcher.extract_transactions()
+        print(md_fetcher.get_transactions().head())
         md_fetcher.close_md_file()
 
         # print Cheese(num_holes=101)
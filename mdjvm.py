@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+"""Process-wide JVM management
+
+usage: python mdjvm.py [--profile cli] [--cds generate] [path to .moneydance folder]
+(starts the JVM with a startup profile, runs the standard reports and prints the startup report;
+with --cds generate or auto, the AppCDS archive is written when the process exits)
+
+JPype allows a single JVM per process, started once. Every module that needs moneydance classes
+registers its jars here and calls ensure_jvm(); the classpaths are merged, the JVM is started on
+first use, and jars registered later are added to the running JVM's class loader.
+
+A StartupProfile chosen before the JVM starts sets heap, GC and JIT options and an AppCDS archive:
+the first run with cds_mode 'auto' dumps the classes it loaded (-XX:ArchiveClassesAtExit), later
+runs with the same classpath and JDK map them from the archive (-XX:SharedArchiveFile) instead of
+loading them from the jars again. Only jars registered before the JVM starts are archived.
+The profile can also be named with the MDJVM_PROFILE environment variable ('default' or 'cli').
+"""
+import os
+import sys
+import time
+import hashlib
+import argparse
+import threading
+import traceback
+from collections import OrderedDict
+from typing import NamedTuple
+from pathlib import Path
+import jpype
+import jpype.imports
+
+MODULE_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+CDS_ARCHIVE_DIR = str(Path(MODULE_DIRECTORY, '.mdjvm').absolute())
+# classes every report run needs; loaded and timed by load_classes(), which also puts them in a new archive
+STARTUP_CLASSES = ['com.moneydance.apps.md.controller.AccountBookWrapper',
+                   'com.infinitekind.moneydance.model.AccountBook',
+                   'com.moneydance.modules.features.invextension.BulkSecInfo',
+                   'com.moneydance.modules.features.invextension.TotalSnapshotReport',
+                   'com.moneydance.modules.features.invextension.TotalFromToReport']
+
+
+class StartupProfile(NamedTuple):
+    heap_min: str = None  # e.g. '256m', passed as -Xms
+    heap_max: str = None  # e.g. '2g', passed as -Xmx
+    gc: str = None  # SerialGC, ParallelGC or G1GC
+    tiered_stop_at_level: int = None  # 1 compiles with C1 only, which warms up fastest for short runs
+    cds_mode: str = 'off'  # off, use (if the archive exists), generate, or auto (use, else generate)
+    cds_archive: str = None  # defaults to a file in CDS_ARCHIVE_DIR keyed by classpath and JVM
+    extra_options: tuple = ()
+
+
+PROFILES = {'default': StartupProfile(),
+            'cli': StartupProfile(gc='SerialGC', tiered_stop_at_level=1, cds_mode='auto',
+                                  extra_options=('-XX:-UsePerfData',))}
+
+_lock = threading.RLock()
+_classpath: list = []
+_profile: StartupProfile = None
+_startup: OrderedDict = None
+
+
+def add_classpath(*paths):
+    with _lock:
+        for path in paths:
+            path = str(Path(path).absolute())
+            if not Path(path).exists():
+                print("classpath entry {0} not found, skipping".format(path))
+            elif path not in _classpath:
+                _classpath.append(path)
+                jpype.addClassPath(path)
+
+
+def get_classpath() -> list:
+    return list(_classpath)
+
+
+def set_startup_profile(profile):
+    # a StartupProfile or the name of one in PROFILES; has no effect once the JVM is running
+    global _profile
+    with _lock:
+        if isinstance(profile, str):
+            if profile not in PROFILES:
+                raise ValueError("unknown startup profile {0}, expected one of {1}".format(profile, list(PROFILES)))
+            profile = PROFILES[profile]
+        if jpype.isJVMStarted():
+            print("JVM already running, startup profile ignored")
+        _profile = profile
+
+
+def get_startup_profile() -> StartupProfile:
+    if _profile is not None:
+        return _profile
+    return PROFILES[os.environ.get('MDJVM_PROFILE', 'default')]
+
+
+def get_cds_archive(profile: StartupProfile) -> str:
+    # the JVM only accepts an archive dumped with the same classpath and JDK, so both are part of the name
+    if profile.cds_archive is not None:
+        return str(Path(profile.cds_archive).absolute())
+    key_source = '\n'.join(_classpath + [jpype.getDefaultJVMPath()])
+    return str(Path(CDS_ARCHIVE_DIR, 'md-{0}.jsa'.format(hashlib.sha1(key_source.encode('utf-8')).hexdigest()[:16])))
+
+
+def get_jvm_options(profile: StartupProfile) -> tuple:
+    # returns the options and how the CDS archive is used: None, 'use' or 'generate'
+    options = []
+    if profile.heap_min is not None:
+        options.append('-Xms' + profile.heap_min)
+    if profile.heap_max is not None:
+        options.append('-Xmx' + profile.heap_max)
+    if profile.gc is not None:
+        options.append('-XX:+Use' + profile.gc)
+    if profile.tiered_stop_at_level is not None:
+        options.append('-XX:TieredStopAtLevel={0:d}'.format(profile.tiered_stop_at_level))
+    cds_usage = None
+    if profile.cds_mode not in ('off', 'use', 'generate', 'auto'):
+        raise ValueError("unknown cds_mode {0}".format(profile.cds_mode))
+    if profile.cds_mode != 'off':
+        cds_archive = get_cds_archive(profile)
+        if profile.cds_mode in ('use', 'auto') and Path(cds_archive).exists():
+            options.append('-XX:SharedArchiveFile=' + cds_archive)
+            cds_usage = 'use'
+        elif profile.cds_mode in ('generate', 'auto'):
+            Path(cds_archive).parent.mkdir(parents=True, exist_ok=True)
+            options.append('-XX:ArchiveClassesAtExit=' + cds_archive)
+            cds_usage = 'generate'
+    options.extend(profile.extra_options)
+    return options, cds_usage
+
+
+def ensure_jvm(*paths) -> bool:
+    # returns True if this call started the JVM
+    global _startup
+    with _lock:
+        add_classpath(*paths)
+        if jpype.isJVMStarted():
+            return False
+        options, cds_usage = get_jvm_options(get_startup_profile())
+        print("Starting JVM with classpath {0}...".format(_classpath))
+        if options:
+            print("JVM options {0}".format(options))
+        start = time.perf_counter()
+        jpype.startJVM(*options)
+        _startup = OrderedDict([('jvm_start_s', time.perf_counter() - start), ('options', options),
+                                ('cds', cds_usage)])
+        return True
+
+
+def load_classes(class_names: list = STARTUP_CLASSES) -> float:
+    # loads (and initializes) the given classes, returning the wall time; missing classes are skipped
+    with _lock:
+        if not jpype.isJVMStarted():
+            raise ValueError("JVM not started, call ensure_jvm() first")
+        start = time.perf_counter()
+        for class_name in class_names:
+            try:
+                jpype.JClass(class_name)
+            except TypeError:
+                print("class {0} not found on the classpath, skipping".format(class_name))
+        class_load_s = time.perf_counter() - start
+        if _startup is not None and 'class_load_s' not in _startup:
+            _startup['class_load_s'] = class_load_s
+        return class_load_s
+
+
+def get_startup_report() -> OrderedDict:
+    # JVM start time, class loading counts from ClassLoadingMXBean, and whether classes came from a CDS archive
+    with _lock:
+        if not jpype.isJVMStarted():
+            raise ValueError("JVM not started, call ensure_jvm() first")
+        from java.lang import System
+        from java.lang.management import ManagementFactory
+        class_loading = ManagementFactory.getClassLoadingMXBean()
+        report = OrderedDict(_startup if _startup is not None else [('jvm_start_s', None)])
+        report.update([('jvm_uptime_s', ManagementFactory.getRuntimeMXBean().getUptime() / 1000.),
+                       ('loaded_classes', int(class_loading.getLoadedClassCount())),
+                       ('total_loaded_classes', int(class_loading.getTotalLoadedClassCount())),
+                       ('sharing', 'sharing' in str(System.getProperty('java.vm.info'))),
+                       ('java_version', str(System.getProperty('java.version')))])
+        return report
+
+
+def main():
+    # run through the importable module, so this script and mdfetcher share one copy of the JVM state
+    import mdjvm
+    try:
+        parser = argparse.ArgumentParser(description="JVM startup profile for moneydance scripts")
+        parser.add_argument('md_folder', nargs='?',
+                            default=str(Path(MODULE_DIRECTORY, 'resources/testMD02.moneydance').absolute()))
+        parser.add_argument('--profile', default='cli', choices=list(PROFILES))
+        parser.add_argument('--cds', choices=['off', 'use', 'generate', 'auto'],
+                            help="override the profile's cds_mode")
+        args = parser.parse_args()
+        profile = mdjvm.PROFILES[args.profile]
+        mdjvm.set_startup_profile(profile._replace(cds_mode=args.cds) if args.cds is not None else profile)
+        moneydance_jar_path = str(Path(MODULE_DIRECTORY, './lib/invextension_bundled.jar').absolute())
+        mdjvm.ensure_jvm(moneydance_jar_path)
+        mdjvm.load_classes()
+        # a full report run loads everything a typical script needs, so a generated archive covers it
+        from mdfetcher import MDFetcher
+        md_fetcher = MDFetcher(md_bundled_jar_location=moneydance_jar_path, md_file_location=args.md_folder)
+        md_fetcher.run_reports()
+        md_fetcher.close_md_file()
+        startup_report = mdjvm.get_startup_report()
+        for key, value in startup_report.items():
+            print("{0}: {1}".format(key, value))
+        if startup_report['cds'] == 'generate':
+            print("CDS archive will be written at exit to {0}".format(
+                mdjvm.get_cds_archive(mdjvm.get_startup_profile())))
+    except Exception as ex:
+        print("Exception in user code:")
+        print('-' * 60)
+        print(str(ex))
+        traceback.print_exc(file=sys.stdout)
+        print('-' * 60)
+
+
+if __name__ == '__main__':
+    main()
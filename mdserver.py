@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+"""Local query server holding a warm JVM and loaded AccountBook
+
+usage: python mdserver.py [path to .moneydance folder] [port]
+
+The JVM, AccountBook, BulkSecInfo and derived reports stay resident, and queries are answered
+over localhost HTTP as JSON ('split' orientation), e.g.
+    GET /net_positions
+    GET /latest_prices
+    GET /balances?date=20100328
+    GET /net_worth?date=20100328
+    GET /net_worth?start=20090801&end=20100401&freq=MS
+    GET /refresh
+Requests are handled one at a time on the server thread, which serializes access to the book.
+"""
+import sys
+import json
+import traceback
+from io import StringIO
+from pathlib import Path
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qsl, urlencode
+from urllib.request import urlopen
+import pandas as pd
+
+from mdfetcher import MDFetcher, MODULE_DIRECTORY
+from pricestore import PriceStore
+
+DEFAULT_PORT = 8765
+
+
+class MDQueryService(object):
+    _md_fetcher: MDFetcher = None
+    _account_wrappers: list = None
+    _price_store: PriceStore = None
+
+    def __init__(self, md_bundled_jar_location: str, md_file_location: str):
+        self._md_fetcher = MDFetcher(md_bundled_jar_location=md_bundled_jar_location,
+                                     md_file_location=md_file_location)
+        self.refresh()
+
+    def refresh(self, params: dict = None):
+        from pyaccountwrapper import PyAccountWrapper
+        self._md_fetcher.run_reports()
+        account_book = self._md_fetcher.get_account_book()
+        self._account_wrappers = PyAccountWrapper.query_accounts_list(account_book)
+        self._price_store = PriceStore.from_account_book(account_book)
+        for account_wrapper in self._account_wrappers:
+            account_wrapper.set_price_store(self._price_store)
+        return pd.DataFrame({'accounts': [len(self._account_wrappers)], 'currencies': [len(self._price_store)]})
+
+    def net_positions(self, params: dict):
+        return self._md_fetcher.get_net_positions()
+
+    def latest_prices(self, params: dict):
+        return self._md_fetcher.get_latest_currency_prices()
+
+    def net_worth(self, params: dict):
+        start = int(params.get('start', params.get('date', 0)))
+        end = int(params.get('end', params.get('date', 0)))
+        if not (start and end):
+            raise ValueError("net worth query needs either 'date' or 'start' and 'end'")
+        return pd.concat([account_wrapper.get_net_worth_series(start, end, params.get('freq', 'D'))
+                          for account_wrapper in self._account_wrappers], ignore_index=True)
+
+    def balances(self, params: dict):
+        return self.net_worth(params).loc[:, ['date', 'parent_account', 'account', 'balance']]
+
+    def close(self):
+        self._md_fetcher.close_md_file()
+
+
+class MDRequestHandler(BaseHTTPRequestHandler):
+    routes = {'/net_positions': 'net_positions', '/latest_prices': 'latest_prices', '/balances': 'balances',
+              '/net_worth': 'net_worth', '/refresh': 'refresh'}
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path not in self.routes:
+            self.send_json(404, {'error': 'unknown query {0}'.format(url.path)})
+            return
+        try:
+            result: pd.DataFrame = getattr(self.server.service, self.routes[url.path])(dict(parse_qsl(url.query)))
+            self.send_json(200, result.to_json(orient='split', date_format='iso'))
+        except ValueError as ex:
+            self.send_json(400, {'error': str(ex)})
+        except Exception as ex:
+            traceback.print_exc(file=sys.stdout)
+            self.send_json(500, {'error': str(ex)})
+
+    def send_json(self, status: int, body):
+        payload = (body if isinstance(body, str) else json.dumps(body)).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def serve(service: MDQueryService, host: str = '127.0.0.1', port: int = DEFAULT_PORT):
+    server = HTTPServer((host, port), MDRequestHandler)
+    server.service = service
+    print("serving moneydance queries on http://{0}:{1:d}".format(host, port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("shutting down...")
+    finally:
+        server.server_close()
+        service.close()
+
+
+def query_md_server(query: str, host: str = '127.0.0.1', port: int = DEFAULT_PORT, **params) -> pd.DataFrame:
+    url = 'http://{0}:{1:d}/{2}'.format(host, port, query.lstrip('/'))
+    if params:
+        url = url + '?' + urlencode(params)
+    with urlopen(url) as response:
+        return pd.read_json(StringIO(response.read().decode('utf-8')), orient='split')
+
+
+def main():
+    try:
+        md_folder = sys.argv[1] if len(sys.argv) > 1 else \
+            str(Path(MODULE_DIRECTORY, 'resources/testMD02.moneydance').absolute())
+        port = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_PORT
+        moneydance_jar_path = str(Path(MODULE_DIRECTORY, './lib/invextension_bundled.jar').absolute())
+        serve(MDQueryService(moneydance_jar_path, md_folder), port=port)
+    except Exception as ex:
+        print("Exception in user code:")
+        print('-' * 60)
+        print(str(ex))
+        traceback.print_exc(file=sys.stdout)
+        print('-' * 60)
+
+
+if __name__ == '__main__':
+    main()
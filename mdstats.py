@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+"""Opt-in instrumentation for MDFetcher and PyAccountWrapper
+
+Public methods are decorated with @instrumented(); while instrumentation is disabled the wrapper is
+a single flag check. enable() starts recording, per method, the call count, wall time, rows
+produced and the number of Python -> Java method calls made through JPype, and optionally appends
+one JSON line per call to a log file:
+
+    import mdstats
+    mdstats.enable(log_path='mdstats.jsonl')
+    md_fetcher.run_reports()
+    print(mdstats.get_stats().to_frame())
+
+JVM calls are counted with sys.monitoring, which needs Python 3.12+: on 3.11 and older jvm_calls
+is always None. Counting takes the profiler tool ID, or another free one if a profiler or debugger
+holds it; when all are taken jvm_calls is None as well.
+Counts and times are inclusive of nested instrumented calls, and the JVM call counter is process
+wide, so calls made concurrently on other threads (e.g. the report pool) are included.
+"""
+import sys
+import json
+import time
+import threading
+import functools
+from collections import OrderedDict
+import pandas as pd
+
+_enabled = False
+_stats = None
+_log_file = None
+_jvm_calls = 0
+
+
+def _count_jvm_call(code, instruction_offset, callable_obj, arg0):
+    global _jvm_calls
+    if type(callable_obj) in _jvm_callable_types:
+        _jvm_calls += 1
+
+
+def _load_jvm_callable_types() -> tuple:
+    # bound java methods and java class constructors; both cross into the JVM
+    try:
+        import _jpype
+        return _jpype._JMethod, _jpype._JClass
+    except (ImportError, AttributeError):
+        return ()
+
+
+_jvm_callable_types = ()
+_monitoring = getattr(sys, 'monitoring', None)
+_tool_id = None  # the sys.monitoring tool ID held while counting
+
+
+def jvm_counting_available() -> bool:
+    return _monitoring is not None
+
+
+def jvm_counting_active() -> bool:
+    return _tool_id is not None
+
+
+def _claim_tool_id():
+    # the profiler ID first, then any free one (IDs 0-5); None if every ID is in use
+    for tool_id in [_monitoring.PROFILER_ID] + [i for i in range(6) if i != _monitoring.PROFILER_ID]:
+        try:
+            _monitoring.use_tool_id(tool_id, 'mdstats')
+            return tool_id
+        except ValueError:
+            continue
+    return None
+
+
+def _start_jvm_counting():
+    global _jvm_callable_types, _tool_id
+    if _monitoring is None or _tool_id is not None:
+        return
+    tool_id = _claim_tool_id()
+    if tool_id is None:
+        print("no free sys.monitoring tool ID, JVM calls won't be counted")
+        return
+    _jvm_callable_types = _load_jvm_callable_types()
+    _monitoring.register_callback(tool_id, _monitoring.events.CALL, _count_jvm_call)
+    _monitoring.set_events(tool_id, _monitoring.events.CALL)
+    _tool_id = tool_id
+
+
+def _stop_jvm_counting():
+    global _tool_id
+    if _tool_id is None:
+        return
+    _monitoring.set_events(_tool_id, 0)
+    _monitoring.register_callback(_tool_id, _monitoring.events.CALL, None)
+    _monitoring.free_tool_id(_tool_id)
+    _tool_id = None
+
+
+class MethodStats(object):
+    __slots__ = ('calls', 'wall_s', 'jvm_calls', 'rows')
+
+    def __init__(self):
+        self.calls = 0
+        self.wall_s = 0.
+        self.jvm_calls = 0 if jvm_counting_active() else None
+        self.rows = 0
+
+    def to_dict(self) -> dict:
+        return OrderedDict([('calls', self.calls), ('wall_s', self.wall_s), ('jvm_calls', self.jvm_calls),
+                            ('rows', self.rows)])
+
+
+class InstrumentationStats(object):
+    _lock: threading.Lock = None
+    _methods: OrderedDict = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._methods = OrderedDict()
+
+    def record(self, method_name: str, wall_s: float, jvm_calls: int = None, rows: int = None):
+        with self._lock:
+            method_stats = self._methods.setdefault(method_name, MethodStats())
+            method_stats.calls += 1
+            method_stats.wall_s += wall_s
+            if jvm_calls is not None and method_stats.jvm_calls is not None:
+                method_stats.jvm_calls += jvm_calls
+            if rows is not None:
+                method_stats.rows += rows
+
+    def get(self, method_name: str) -> MethodStats:
+        return self._methods.get(method_name)
+
+    def reset(self):
+        with self._lock:
+            self._methods = OrderedDict()
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return OrderedDict((name, method_stats.to_dict()) for name, method_stats in self._methods.items())
+
+    def to_frame(self) -> pd.DataFrame:
+        stats_frame = pd.DataFrame.from_dict(self.to_dict(), orient='index',
+                                             columns=['calls', 'wall_s', 'jvm_calls', 'rows'])
+        stats_frame.index.name = 'method'
+        return stats_frame.sort_values('wall_s', ascending=False)
+
+    def to_json(self, path: str = None) -> str:
+        stats_json = json.dumps(self.to_dict(), indent=2)
+        if path is not None:
+            with open(path, 'w') as json_file:
+                json_file.write(stats_json)
+        return stats_json
+
+
+def enable(log_path: str = None, reset: bool = True) -> InstrumentationStats:
+    global _enabled, _stats, _log_file
+    if _enabled:
+        disable()
+    if _stats is None or reset:
+        _stats = InstrumentationStats()
+    _start_jvm_counting()
+    try:
+        _log_file = open(log_path, 'a') if log_path is not None else None
+    except OSError:
+        _stop_jvm_counting()
+        raise
+    _enabled = True
+    return _stats
+
+
+def disable():
+    global _enabled, _log_file
+    if not _enabled:
+        return
+    _enabled = False
+    _stop_jvm_counting()
+    if _log_file is not None:
+        _log_file.close()
+        _log_file = None
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def get_stats() -> InstrumentationStats:
+    return _stats
+
+
+def count_rows(result):
+    if isinstance(result, (pd.DataFrame, pd.Series)):
+        return len(result)
+    return None
+
+
+def instrumented(rows=None):
+    # rows names an attribute of self holding the produced frame (for methods that store rather than
+    # return their result) or is a callable applied to the return value; by default a returned frame counts
+    def decorator(method):
+        method_name = method.__qualname__
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return method(*args, **kwargs)
+            jvm_calls_start = _jvm_calls
+            start = time.perf_counter()
+            result = method(*args, **kwargs)
+            wall_s = time.perf_counter() - start
+            jvm_calls = _jvm_calls - jvm_calls_start if _tool_id is not None else None
+            if rows is None:
+                row_count = count_rows(result)
+            elif callable(rows):
+                row_count = rows(result)
+            else:
+                row_count = count_rows(getattr(args[0], rows, None))
+            stats = _stats
+            if stats is not None:
+                stats.record(method_name, wall_s, jvm_calls, row_count)
+            log_file = _log_file
+            if log_file is not None:
+                log_file.write(json.dumps({'method': method_name, 'time': time.time(), 'wall_s': wall_s,
+                                           'jvm_calls': jvm_calls, 'rows': row_count}) + '\n')
+            return result
+        return wrapper
+    return decorator
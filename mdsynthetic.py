@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+"""Synthetic moneydance books for scaling tests
+
+usage: python mdsynthetic.py target.moneydance [transactions] [accounts] [securities] [snapshots]
+
+A copy of the sample data set is extended headlessly with generated bank accounts, expense
+categories, securities (each held in a security sub-account of one investment account), daily
+price snapshots, bank/category transactions and buy/sell/dividend investment transactions in
+proportion to the bank transactions, then saved once.
+"""
+import sys
+import shutil
+import traceback
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from mdfetcher import MDFetcher, MODULE_DIRECTORY
+
+TEMPLATE_FOLDER = str(Path(MODULE_DIRECTORY, 'resources/testMD02.moneydance').absolute())
+
+
+def make_account(md_fetcher: MDFetcher, account_type: str, parent, name: str, currency=None):
+    from com.infinitekind.moneydance.model import Account
+    account = Account.makeAccount(md_fetcher.get_account_book(), getattr(Account.AccountType, account_type), parent)
+    account.setAccountName(name)
+    if currency is not None:
+        account.setCurrencyType(currency)
+    account.syncItem()
+    return account
+
+
+def make_security(md_fetcher: MDFetcher, name: str, ticker: str, price: float):
+    # as in create_new_security.txt: decimal places are set before the rate
+    from com.infinitekind.moneydance.model import CurrencyType
+    currency_table = md_fetcher.get_account_book().getCurrencies()
+    security = CurrencyType(currency_table)
+    security.setCurrencyType(CurrencyType.Type.SECURITY)
+    security.setName(name)
+    security.setTickerSymbol(ticker)
+    security.setDecimalPlaces(4)
+    security.setUserRate(1.0 / price, currency_table.getBaseType())
+    security.syncItem()
+    return security
+
+
+def make_price_rows(tickers: list, n_snapshots: int, last_date: pd.Timestamp, rng) -> pd.DataFrame:
+    # geometric random walk per ticker over the n_snapshots business days ending at last_date
+    dates = pd.bdate_range(end=last_date, periods=n_snapshots)
+    date_ints = np.asarray(dates.strftime('%Y%m%d'), dtype=np.int64)
+    walks = 50. * np.exp(np.cumsum(rng.normal(0., 0.01, (len(tickers), n_snapshots)), axis=1))
+    return pd.DataFrame({'ticker': np.repeat(tickers, n_snapshots), 'dateInt': np.tile(date_ints, len(tickers)),
+                         'price': walks.ravel()})
+
+
+def make_transaction_rows(account_ids: list, category_ids: list, n_transactions: int, last_date: pd.Timestamp,
+                          rng, n_days: int = 3650) -> pd.DataFrame:
+    # mostly expenses with some refunds, spread over the n_days before last_date
+    dates = last_date - pd.to_timedelta(rng.integers(0, n_days, n_transactions), unit='D')
+    accounts = np.asarray(account_ids, dtype=object)[rng.integers(0, len(account_ids), n_transactions)]
+    categories = np.asarray(category_ids, dtype=object)[rng.integers(0, len(category_ids), n_transactions)]
+    signs = np.where(rng.random(n_transactions) < 0.2, 1, -1)
+    payees = ['synthetic payee {0:d}'.format(i) for i in rng.integers(0, 5000, n_transactions)]
+    return pd.DataFrame({'date': np.asarray(dates.strftime('%Y%m%d'), dtype=np.int64), 'account': accounts,
+                         'category': categories, 'amount': signs * rng.integers(100, 500000, n_transactions),
+                         'description': payees, 'memo': '', 'status': 'X'})
+
+
+def make_investment_rows(prices: pd.DataFrame, n_transactions: int, rng) -> pd.DataFrame:
+    # buys, sells of at most the shares held, and dividends at snapshot prices, in date order
+    picks = prices.iloc[np.sort(rng.integers(0, len(prices), n_transactions))] if len(prices) else prices
+    picks = picks.sort_values('dateInt', kind='stable')
+    holdings, kinds, shares = {}, [], []
+    for ticker, draw in zip(picks['ticker'], rng.random(len(picks))):
+        held = holdings.get(ticker, 0.)
+        if draw < 0.2 and held > 0.:
+            kind, quantity = 'SELL', float(np.ceil(held * draw * 2.5))
+            quantity = min(quantity, held)
+        elif draw < 0.3 and held > 0.:
+            kind, quantity = 'DIVIDEND', 0.
+        else:
+            kind, quantity = 'BUY', float(rng.integers(1, 200))
+        holdings[ticker] = held + (quantity if kind == 'BUY' else -quantity if kind == 'SELL' else 0.)
+        kinds.append(kind)
+        shares.append(quantity)
+    return pd.DataFrame({'ticker': picks['ticker'].values, 'dateInt': picks['dateInt'].values,
+                         'price': picks['price'].values, 'type': kinds, 'shares': shares})
+
+
+def insert_investment_transactions(md_fetcher: MDFetcher, investment_account, security_accounts: dict,
+                                   income_category, rows: pd.DataFrame) -> int:
+    # InvestFields fills in the parent and the security/fee/income splits as the investment register would
+    from com.infinitekind.moneydance.model import InvestFields
+    from com.infinitekind.moneydance.model import InvestTxnType
+    from com.infinitekind.moneydance.model import ParentTxn
+    for ticker, date_int, price, txn_type, shares in zip(rows['ticker'], rows['dateInt'], rows['price'],
+                                                         rows['type'], rows['shares']):
+        ptxn = ParentTxn(md_fetcher.get_account_book())
+        ptxn.setAccount(investment_account)
+        fields = InvestFields()
+        fields.setFieldStatus(getattr(InvestTxnType, txn_type), ptxn)
+        fields.date = fields.taxDate = int(date_int)
+        fields.security = security_accounts[ticker]
+        fields.payee = 'Synthetic {0} {1}'.format(txn_type.lower(), ticker)
+        if txn_type == 'DIVIDEND':
+            fields.amount = int(round(price * 100.))  # one price's worth of cash per dividend, in cents
+            fields.category = income_category
+        else:
+            fields.shares = int(round(shares * 10000.))  # securities are created with 4 decimal places
+            fields.price = float(price)
+            fields.amount = int(round(shares * price * 100.))
+        fields.storeFields(ptxn)
+        ptxn.syncItem()
+    return len(rows)
+
+
+def generate_book(target_folder: str, md_bundled_jar_location: str, n_transactions: int = 10000,
+                  n_accounts: int = 20, n_securities: int = 100, n_snapshots: int = 250,
+                  template_folder: str = TEMPLATE_FOLDER, seed: int = 0, chunk_size: int = 50000,
+                  investment_ratio: float = 0.2) -> dict:
+    # investment_ratio sets the investment transactions generated per bank transaction
+    if Path(target_folder).exists():
+        raise ValueError("target folder {0} already exists".format(target_folder))
+    shutil.copytree(template_folder, target_folder)
+    rng = np.random.default_rng(seed)
+    last_date = pd.Timestamp.now().normalize()
+    md_fetcher = MDFetcher(md_bundled_jar_location=md_bundled_jar_location, md_file_location=target_folder)
+    root_account = md_fetcher.get_account_book().getRootAccount()
+    base_currency = md_fetcher.get_account_book().getCurrencies().getBaseType()
+    print("generating {0:d} accounts, {1:d} securities...".format(n_accounts, n_securities))
+    account_ids = [str(make_account(md_fetcher, 'BANK', root_account, 'Synthetic Bank {0:d}'.format(i),
+                                    base_currency).getUUID()) for i in range(n_accounts)]
+    category_ids = [str(make_account(md_fetcher, 'EXPENSE', root_account, 'Synthetic Expense {0:d}'.format(i),
+                                     base_currency).getUUID()) for i in range(max(1, n_accounts // 2))]
+    income_category = make_account(md_fetcher, 'INCOME', root_account, 'Synthetic Dividends', base_currency)
+    investment_account = make_account(md_fetcher, 'INVESTMENT', root_account, 'Synthetic Brokerage', base_currency)
+    tickers = ['SYN{0:04d}'.format(i) for i in range(n_securities)]
+    security_accounts = {}
+    for ticker in tickers:
+        security = make_security(md_fetcher, 'Synthetic Security {0}'.format(ticker), ticker, 50.)
+        security_accounts[ticker] = make_account(md_fetcher, 'SECURITY', investment_account, security.getName(),
+                                                 security)
+    print("generating {0:d} price snapshots per security...".format(n_snapshots))
+    prices = make_price_rows(tickers, n_snapshots, last_date, rng) if n_securities > 0 and n_snapshots > 0 else \
+        pd.DataFrame({'ticker': tickers, 'dateInt': int(last_date.strftime('%Y%m%d')), 'price': 50.})
+    if n_snapshots > 0:
+        md_fetcher.update_prices(prices)
+    n_investment_transactions = int(n_transactions * investment_ratio) if n_securities > 0 else 0
+    print("generating {0:d} investment transactions...".format(n_investment_transactions))
+    insert_investment_transactions(md_fetcher, investment_account, security_accounts, income_category,
+                                   make_investment_rows(prices, n_investment_transactions, rng))
+    print("generating {0:d} transactions...".format(n_transactions))
+    for start in range(0, n_transactions, chunk_size):
+        md_fetcher.insert_transactions(make_transaction_rows(account_ids, category_ids,
+                                                             min(chunk_size, n_transactions - start), last_date, rng),
+                                       save=False)
+    print("AccountBook Saved? {0}".format(md_fetcher.get_account_book().save()))
+    md_fetcher.close_md_file()
+    return {'folder': target_folder, 'transactions': n_transactions,
+            'investment_transactions': n_investment_transactions, 'accounts': n_accounts,
+            'securities': n_securities, 'snapshots': n_snapshots}
+
+
+def main():
+    try:
+        target_folder = sys.argv[1]
+        counts = [int(x) for x in sys.argv[2:6]]
+        moneydance_jar_path = str(Path(MODULE_DIRECTORY, './lib/invextension_bundled.jar').absolute())
+        print(generate_book(target_folder, moneydance_jar_path, *counts))
+    except Exception as ex:
+        print("Exception in user code:")
+        print('-' * 60)
+        print(str(ex))
+        traceback.print_exc(file=sys.stdout)
+        print('-' * 60)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+"""In-memory price history for moneydance currencies and securities
+
+Snapshots are read once from each CurrencyType into sorted numpy arrays, after which
+(ticker, date) valuations are answered by binary search without touching the JVM.
+"""
+from array import array
+import numpy as np
+import pandas as pd
+
+DATE_KEY_SPAN = 100000000  # dateInts are yyyymmdd, so code * span + dateInt orders by currency, then date
+
+
+def to_date_ints(dates) -> np.ndarray:
+    dates = np.atleast_1d(np.asarray(dates))
+    if dates.dtype.kind == 'M' or dates.dtype == object:
+        return np.asarray(pd.DatetimeIndex(dates).strftime('%Y%m%d'), dtype=np.int64)
+    return dates.astype(np.int64)
+
+
+class PriceStore(object):
+    _codes: dict = None
+    _ids: list = None
+    _tickers: list = None
+    _names: list = None
+    _keys: np.ndarray = None
+    _rates: np.ndarray = None
+    _starts: np.ndarray = None
+    _ends: np.ndarray = None
+    _current_rates: np.ndarray = None
+
+    def __init__(self, currencies):
+        self._codes = {}
+        self._ids, self._tickers, self._names = [], [], []
+        snap_codes, snap_dates, snap_rates = array('q'), array('q'), array('d')
+        current_rates = array('d')
+        for code, currency in enumerate(currencies):
+            currency_id, ticker = str(currency.getUUID()), str(currency.getTickerSymbol())
+            self._ids.append(currency_id)
+            self._tickers.append(ticker)
+            self._names.append(str(currency.getName()))
+            self._codes[currency_id] = code
+            if ticker:
+                self._codes.setdefault(ticker, code)
+            current_rates.append(currency.getRelativeRate())
+            for snapshot in currency.getSnapshots():
+                snap_codes.append(code)
+                snap_dates.append(snapshot.getDateInt())
+                snap_rates.append(snapshot.getRate())
+        codes = np.frombuffer(snap_codes, dtype=np.int64)
+        keys = codes * DATE_KEY_SPAN + np.frombuffer(snap_dates, dtype=np.int64)
+        order = np.argsort(keys, kind='stable')
+        self._keys = keys[order]
+        self._rates = np.frombuffer(snap_rates, dtype=np.float64)[order]
+        self._current_rates = np.frombuffer(current_rates, dtype=np.float64).copy()
+        code_range = np.arange(len(self._ids), dtype=np.int64)
+        self._starts = np.searchsorted(codes[order], code_range, side='left')
+        self._ends = np.searchsorted(codes[order], code_range, side='right')
+
+    @classmethod
+    def from_account_book(cls, account_book):
+        return cls(account_book.getCurrencies().getAllCurrencies())
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, key):
+        return key in self._codes
+
+    def get_codes(self, keys) -> np.ndarray:
+        # tickers or UUIDs to internal codes, -1 where unknown; resolved once per distinct key
+        keys = np.atleast_1d(np.asarray(keys, dtype=object))
+        unique_keys, inverse = np.unique(keys.astype(str), return_inverse=True)
+        unique_codes = np.array([self._codes.get(key, -1) for key in unique_keys], dtype=np.int64)
+        return unique_codes[inverse.ravel()]
+
+    def rate_as_of(self, keys, dates) -> np.ndarray:
+        # dates before a currency's first snapshot take its earliest rate, currencies without snapshots
+        # take their current relative rate, and unknown keys come back as nan
+        codes, date_ints = np.broadcast_arrays(self.get_codes(keys), to_date_ints(dates))
+        known = codes >= 0
+        if not known.any():
+            return np.full(codes.shape, np.nan)
+        safe_codes = np.where(known, codes, 0)
+        starts, ends = self._starts[safe_codes], self._ends[safe_codes]
+        positions = np.searchsorted(self._keys, safe_codes * DATE_KEY_SPAN + date_ints, side='right') - 1
+        positions = np.clip(positions, starts, np.maximum(ends - 1, starts))
+        rates = self._current_rates[safe_codes]
+        has_snapshots = ends > starts
+        rates[has_snapshots] = self._rates[positions[has_snapshots]]
+        return np.where(known, rates, np.nan)
+
+    def price_as_of(self, keys, dates) -> np.ndarray:
+        with np.errstate(divide='ignore'):
+            return 1. / self.rate_as_of(keys, dates)
+
+    def get_currencies(self) -> pd.DataFrame:
+        return pd.DataFrame({'id': self._ids, 'Name': self._names, 'Ticker': self._tickers,
+                             'Snapshots': self._ends - self._starts})
@@ -2,7 +2,10 @@
 """
 This is a python-based wrapper class for moneydance data
 
+Importing this module doesn't start java: the JVM is started (with whatever mdjvm startup profile
+is set by then) on first use, and moneydance classes are imported where they are needed.
 """
+from __future__ import annotations  # java types in annotations are never evaluated
 import sys
 import traceback
 from pprint import pprint
@@ -15,6 +18,9 @@ from datetime import datetime, date
 import os
 import re
 import itertools
+from array import array
+
+from pricestore import PriceStore
 
 pd.set_option('display.max_columns', 500)
 pd.set_option('display.max_rows', 500)
@@ -24,92 +30,82 @@ pd.options.display.float_format = '{:,.2f}'.format
 import jpype
 import jpype.imports
 from jpype.types import *
+import mdjvm
+import mdarrays
+from mdstats import instrumented
 #%%
-# get oriented, print current working directory (script is based on working directory as project root)
-print("Working Directory: {0}".format(os.getcwd()))
-#%%
-# Launch the JVM
+# the moneydance jar, relative to the working directory (scripts are run from the project root)
 moneydance_jar_path = 'lib/moneydance.jar'
-print("Moneydance Jar File exists? {0}, in {1}".format(os.path.exists(moneydance_jar_path), moneydance_jar_path))
-print("Starting JVM...")
-jpype.startJVM(classpath=[moneydance_jar_path])
-#%%
-# import useful classes from moneydance jar
-from com.moneydance.apps.md.controller import AccountBookWrapper
-from com.infinitekind.moneydance.model import AccountBook
-from com.infinitekind.moneydance.model import Account
-from com.infinitekind.moneydance.model.Account import AccountType
-from com.infinitekind.moneydance.model.AccountUtil import getBalanceAsOfDate
-from com.infinitekind.moneydance.model import TxnSet
-from com.infinitekind.moneydance.model import AbstractTxn
-from com.infinitekind.moneydance.model import ParentTxn
-from com.infinitekind.moneydance.model import SplitTxn
-from com.infinitekind.moneydance.model import TxnUtil
-from com.infinitekind.moneydance.model import CurrencyType
-from com.infinitekind.moneydance.model import CurrencySnapshot
-from com.infinitekind.moneydance.model import CurrencyTable
-from com.infinitekind.moneydance.model import CurrencyUtil
-from com.infinitekind.moneydance.model import MoneydanceSyncableItem
-#%%
-from java.io import File
-from java.lang import String
-from java.lang import Long
-from java.lang import Integer
 
 
+def init_jvm():
+    # launch the JVM, or add the moneydance jar to the one already running in this process
+    print("Working Directory: {0}".format(os.getcwd()))
+    print("Moneydance Jar File exists? {0}, in {1}".format(os.path.exists(moneydance_jar_path), moneydance_jar_path))
+    mdjvm.ensure_jvm(moneydance_jar_path)
 
 
 class PyAccountWrapper:
-    _account_book: AccountBook = None
-    _account: Account = None
-    _id: String = None
-    _name: String = None
-    _type: AccountType = None
-    _is_investment: bool = False
-    _is_security: bool = False
-    _security_account_wrappers: list = None
+    # slots and lazy loading keep large books cheap: nothing is read from java until it's asked for,
+    # and security sub-account wrappers are built on first access
+    __slots__ = ('_account_book', '_account', '_id', '_name', '_type', '_is_security',
+                 '_security_account_wrappers', '_price_store')
+    _account_book: AccountBook
+    _account: Account
+    _id: str
+    _name: str
+    _type: str
+    _is_security: bool
+    _security_account_wrappers: list
+    _price_store: PriceStore
     date_int_fmt = '%Y%m%d'
     excluded_types = ['INCOME', 'EXPENSE']
     valid_types = ['ROOT', 'BANK', 'CREDIT_CARD', 'INVESTMENT', 'SECURITY',
                    'ASSET', 'LIABILITY','LOAN', 'EXPENSE', 'INCOME']
 
-    def __init__(self, account_book: AccountBook, account: Account):
+    def __init__(self, account_book: AccountBook, account: Account, is_security: bool = False):
         self._account_book = account_book
         self._account = account
-        self._id = str(account.getUUID())
-        self._name = str(account.getAccountName())
-        self._type = str(account.getAccountType())
-        if self._type == 'INVESTMENT':
-            self._is_investment = True
-            self._security_account_wrappers = []
-            securityAccounts = account.getSubAccounts()
-            for securityAccount in securityAccounts:
-                security_balance: PyAccountWrapper = PyAccountWrapper(self._account_book, securityAccount)
-                security_balance.set_is_security(True)
-                self._security_account_wrappers.append(security_balance)
+        self._id = None
+        self._name = None
+        self._type = None
+        self._is_security = is_security
+        self._security_account_wrappers = None
+        self._price_store = None
 
     def set_is_security(self, is_security: bool):
         self._is_security = is_security
 
+    def set_price_store(self, price_store: PriceStore):
+        # wrappers already built get the store now, the rest when they are created
+        self._price_store = price_store
+        if self._security_account_wrappers:
+            for security_account_wrapper in self._security_account_wrappers:
+                security_account_wrapper.set_price_store(price_store)
+
+    @instrumented()
     def get_balance_as_of(self, close_date_int: int):
+        from com.infinitekind.moneydance.model.AccountUtil import getBalanceAsOfDate
         divisor: float = 10000. if self._is_security else 100.
         return float(getBalanceAsOfDate(self._account_book, self._account, close_date_int, True)) / divisor
 
     def __str__(self):
-        output_str = str(self._name) + ' ' + str(self._id) + " " + str(self._type) + '\n'
-        if self._security_account_wrappers:
-            for security_account_wrapper in self._security_account_wrappers:
+        output_str = self.get_name() + ' ' + self.get_id() + " " + self.get_type() + '\n'
+        if self.is_investment():
+            for security_account_wrapper in self.get_security_account_wrappers():
                 output_str = output_str + "  " + str(security_account_wrapper)
             return output_str
         else:
             return output_str
 
+    @instrumented()
     def get_security_snapshot(self, date_int: int):
         if self._is_security:
             return self._account.getCurrencyType().getSnapshotForDate(date_int)
         else:
             return None
 
+    @instrumented()
     def get_account_value_as_of(self, date_int: int, account_name: str, parent_account_name: str):
         balance = self.get_balance_as_of(date_int)
         price = self.get_price(date_int)
@@ -118,22 +114,84 @@ class PyAccountWrapper:
                           'price':price, 'total': price * balance}
         return net_worth_dict
 
+    @instrumented(len)
     def get_net_worth_as_of(self, date_int: int):
-        out_list = [self.get_account_value_as_of(date_int, 'CASH', self._name)]
-        if self._security_account_wrappers is None or len(self._security_account_wrappers) == 0:
+        out_list = [self.get_account_value_as_of(date_int, 'CASH', self.get_name())]
+        if not self.is_investment() or len(self.get_security_account_wrappers()) == 0:
             return out_list
         else:
-            for security_account_wrapper in self._security_account_wrappers:
+            for security_account_wrapper in self.get_security_account_wrappers():
                 security_new_worth = security_account_wrapper\
-                    .get_account_value_as_of(date_int, security_account_wrapper.get_name(), self._name)
+                    .get_account_value_as_of(date_int, security_account_wrapper.get_name(), self.get_name())
                 out_list.append(security_new_worth)
             return out_list
 
+    @instrumented()
     def get_price(self, date_int: int):
         currency_type = self._account.getCurrencyType()
+        if self._price_store is not None:
+            return float(self._price_store.price_as_of(str(currency_type.getUUID()), date_int)[0])
         return 1. / currency_type.getRelativeRate(date_int)
 
+    @instrumented(len)
+    def get_balance_series(self, date_ints: np.ndarray) -> np.ndarray:
+        # all dates in one java call: int[] in and long[] out, each moved as a single buffer copy.
+        # Both paths give the account's own balance without sub-accounts (includeSubAccounts False), since
+        # security sub-accounts are valued in their own rows of the net worth series
+        from com.infinitekind.moneydance.model import AccountUtil
+        divisor: float = 10000. if self._is_security else 100.
+        if hasattr(AccountUtil, 'getBalancesAsOfDates'):
+            balances = AccountUtil.getBalancesAsOfDates(self._account_book, self._account,
+                                                        mdarrays.to_java_array(date_ints, 'int'), False)
+            return mdarrays.to_numpy(balances) / divisor
+        # older builds: one pass over the register, then balances for every date by cumulative sum
+        txn_dates = array('q')
+        txn_values = array('q')
+        for txn in self.get_transactions().iterableTxns():
+            txn_dates.append(txn.getDateInt())
+            txn_values.append(txn.getValue())
+        txn_dates = np.frombuffer(txn_dates, dtype=np.int64)
+        order = np.argsort(txn_dates, kind='stable')
+        cum_values = np.concatenate([[0], np.cumsum(np.frombuffer(txn_values, dtype=np.int64)[order])])
+        positions = np.searchsorted(txn_dates[order], date_ints, side='right')
+        return (int(self._account.getStartBalance()) + cum_values[positions]) / divisor
+
+    @instrumented(len)
+    def get_price_series(self, date_ints: np.ndarray) -> np.ndarray:
+        currency_type = self._account.getCurrencyType()
+        price_store = self._price_store if self._price_store is not None else PriceStore([currency_type])
+        return price_store.price_as_of(str(currency_type.getUUID()), date_ints)
+
+    @instrumented()
+    def get_account_value_series(self, dates: pd.DatetimeIndex, account_name: str, parent_account_name: str):
+        date_ints = np.asarray(dates.strftime(self.date_int_fmt), dtype=np.int64)
+        balance = self.get_balance_series(date_ints)
+        price = self.get_price_series(date_ints)
+        return pd.DataFrame({'date': dates, 'parent_account': parent_account_name,
+                             'account': account_name, 'balance': balance,
+                             'price': price, 'total': price * balance})
+
+    @instrumented()
+    def get_net_worth_series(self, start, end, freq: str = 'D'):
+        dates = pd.date_range(to_timestamp(start), to_timestamp(end), freq=freq)
+        out_frames = [self.get_account_value_series(dates, 'CASH', self.get_name())]
+        if self.is_investment():
+            for security_account_wrapper in self.get_security_account_wrappers():
+                out_frames.append(security_account_wrapper
+                                  .get_account_value_series(dates, security_account_wrapper.get_name(),
+                                                            self.get_name()))
+        return pd.concat(out_frames, ignore_index=True)
+
     def get_security_account_wrappers(self):
+        # None for accounts other than investment accounts, as before
+        if self._security_account_wrappers is None and self.is_investment():
+            security_account_wrappers = []
+            for securityAccount in self._account.getSubAccounts():
+                security_account_wrapper = PyAccountWrapper(self._account_book, securityAccount, True)
+                if self._price_store is not None:
+                    security_account_wrapper.set_price_store(self._price_store)
+                security_account_wrappers.append(security_account_wrapper)
+            self._security_account_wrappers = security_account_wrappers
         return self._security_account_wrappers
 
     def get_account(self):
@@ -142,10 +200,26 @@ class PyAccountWrapper:
     def get_transactions(self):
         return self._account_book.getTransactionSet().getTransactionsForAccount(self._account)
 
+    def get_id(self):
+        if self._id is None:
+            self._id = str(self._account.getUUID())
+        return self._id
+
     def get_name(self):
+        if self._name is None:
+            self._name = str(self._account.getAccountName())
         return self._name
 
+    def get_type(self):
+        if self._type is None:
+            self._type = str(self._account.getAccountType())
+        return self._type
+
+    def is_investment(self):
+        return self.get_type() == 'INVESTMENT'
+
     @staticmethod
+    @instrumented(len)
     def query_accounts_list(account_book: AccountBook):
         out_list = []
         root_account: Account = account_book.getRootAccount()
@@ -155,7 +229,17 @@ class PyAccountWrapper:
                 out_list.append(PyAccountWrapper(account_book, account))
         return out_list
 
+def to_timestamp(date_like) -> pd.Timestamp:
+    # accepts moneydance date ints (20090815) as well as anything pandas understands
+    if isinstance(date_like, (int, np.integer)):
+        return pd.Timestamp(str(date_like))
+    return pd.Timestamp(date_like)
+
+
 def get_accounts_list_from_md_data(md_folder: str):
+    init_jvm()
+    from java.io import File
+    from com.moneydance.apps.md.controller import AccountBookWrapper
     print("prove moneydance data file exists, load it into java File object")
 
     print("Moneydance Data File exists? {0}, in {1}".format(os.path.exists(md_folder), md_folder))
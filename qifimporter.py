@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+"""Headless QIF import for moneydance data
+
+usage: python qifimporter.py [qif file] [.moneydance folder] [account name]
+
+QIF records are streamed from the file by a generator, categories are mapped onto moneydance
+accounts, and transactions go in through MDFetcher.insert_transactions in chunks with a single
+save at the end, so no MoneydanceGUI (or display) is needed.
+"""
+import sys
+import shutil
+import tempfile
+import traceback
+from decimal import Decimal
+from pathlib import Path
+import pandas as pd
+
+from mdfetcher import MDFetcher, MODULE_DIRECTORY
+from duplicateindex import DuplicateIndex
+
+QIF_TRANSACTION_TYPES = ['Bank', 'Cash', 'CCard', 'Oth A', 'Oth L']
+
+
+def parse_qif_date(qif_date: str) -> int:
+    # handles 2/10'2020, 2/10'20, 02/10/2020, 02-10-20 and 2020-02-10; an apostrophe marks years 2000+
+    text = qif_date.strip().replace(' ', '')
+    parts = text.replace("'", '/').replace('-', '/').split('/')
+    if len(parts) != 3:
+        raise ValueError("unrecognized QIF date '{0}'".format(qif_date))
+    if len(parts[0]) == 4:
+        year, month, day = (int(x) for x in parts)
+    else:
+        month, day, year = (int(x) for x in parts)
+        if year < 100:
+            year += 2000 if "'" in text or year < 50 else 1900
+    return year * 10000 + month * 100 + day
+
+
+def parse_qif_amount(qif_amount: str) -> int:
+    # exact decimal to cents, so no float rounding on the way in
+    return int((Decimal(qif_amount.strip().replace(',', '')) * 100).to_integral_value())
+
+
+def iter_qif_records(lines):
+    # yields one dict per transaction; 'splits' holds the S/E/$ groups in file order, and 'first' marks the
+    # first transaction after a !Type header, where exports put the opening balance. Fields are only read in
+    # transaction sections: !Account, !Option:* and !Clear:* headers (and !Type:Cat etc.) end the section
+    qif_type, record, first = None, {}, True
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if not line.strip():
+            continue
+        code, value = line[0], line[1:].strip()
+        if code == '!':
+            qif_type = value[len('Type:'):].strip() if value.startswith('Type:') else None
+            first = True
+            record = {}
+            continue
+        if qif_type not in QIF_TRANSACTION_TYPES:
+            continue
+        if code == '^':
+            if record:
+                record['type'], record['first'] = qif_type, first
+                first = False
+                yield record
+            record = {}
+            continue
+        if code == 'D':
+            record['date'] = parse_qif_date(value)
+        elif code in ('T', 'U'):
+            record['amount'] = parse_qif_amount(value)
+        elif code == 'P':
+            record['payee'] = value
+        elif code == 'M':
+            record['memo'] = value
+        elif code == 'N':
+            record['number'] = value
+        elif code == 'C':
+            record['cleared'] = value
+        elif code == 'L':
+            record['category'] = value
+        elif code == 'S':
+            record.setdefault('splits', []).append({'category': value, 'memo': '', 'amount': 0})
+        elif code == 'E' and record.get('splits'):
+            record['splits'][-1]['memo'] = value
+        elif code == '$' and record.get('splits'):
+            record['splits'][-1]['amount'] = parse_qif_amount(value)
+
+
+def iter_qif_file(qif_path: str, encoding: str = 'utf-8'):
+    with open(qif_path, 'r', encoding=encoding, errors='replace') as qif_file:
+        yield from iter_qif_records(qif_file)
+
+
+def is_opening_balance(record: dict) -> bool:
+    # exports start each account with 'Opening Balance' as a transfer to the exported account, L[name]
+    return record.get('first', False) and record.get('payee', '').strip().lower() == 'opening balance' and \
+        record.get('category', '').strip().startswith('[')
+
+
+def get_category_key(qif_category: str) -> str:
+    # '[Checking]' is a transfer to that account, 'Food:Groceries/Class' drops the class
+    qif_category = qif_category.strip()
+    if qif_category.startswith('[') and ']' in qif_category:
+        return qif_category[1:qif_category.index(']')]
+    return qif_category.split('/')[0]
+
+
+def qif_records_to_rows(records, account: str, first_txn: int = 0) -> list:
+    # split rows in the layout MDFetcher.insert_transactions expects
+    rows = []
+    for txn, record in enumerate(records, start=first_txn):
+        # a record without a date keeps None, which insert_transactions rejects
+        parent = {'txn': txn, 'date': record.get('date'), 'account': account,
+                  'description': record.get('payee', ''), 'memo': record.get('memo', ''),
+                  'status': record.get('cleared', ''), 'check_number': record.get('number', '')}
+        splits = record.get('splits') or [{'category': record.get('category', ''), 'memo': None,
+                                           'amount': record.get('amount', 0)}]
+        for split in splits:
+            rows.append(dict(parent, category=get_category_key(split['category']), amount=split['amount'],
+                             split_memo=split['memo']))
+    return rows
+
+
+def import_qif(md_fetcher: MDFetcher, qif_path: str, account_name: str, category_map: dict = None,
+               default_category: str = None, chunk_size: int = 5000, skip_duplicates: bool = True,
+               date_window: int = 3) -> dict:
+    from com.infinitekind.moneydance.model import AccountUtil
+    accounts = md_fetcher.get_account_index()
+    if account_name not in accounts:
+        raise ValueError("unknown account {0}".format(account_name))
+    account = accounts[account_name]
+    account_id = str(account.getUUID())
+    category_map = {} if category_map is None else category_map
+    if default_category is None:
+        default_category = str(AccountUtil.getDefaultCategoryForAcct(account).getUUID())
+    resolved = {}
+    counts = {'records': 0, 'transactions': 0, 'duplicates': 0, 'skipped': 0, 'unknown_categories': 0}
+    unknown_categories = set()
+
+    def resolve(category_key: str) -> str:
+        # unknown categories go to the default category, and are counted and named in the summary
+        if category_key not in resolved:
+            mapped = category_map.get(category_key, category_key)
+            if mapped in accounts:
+                resolved[category_key] = str(accounts[mapped].getUUID())
+            else:
+                resolved[category_key] = default_category
+                if category_key:
+                    unknown_categories.add(category_key)
+        if category_key in unknown_categories:
+            counts['unknown_categories'] += 1
+        return resolved[category_key]
+
+    # built once from the register; rows inserted by this import are not added, so repeated identical
+    # rows in one statement are all kept
+    duplicate_index = DuplicateIndex.from_account(md_fetcher.get_account_book(), account, date_window) \
+        if skip_duplicates else None
+
+    def flush(chunk: list):
+        if not chunk:
+            return
+        rows = pd.DataFrame(qif_records_to_rows(chunk, account_id, counts['records']))
+        rows['category'] = [resolve(key) for key in rows['category']]
+        counts['transactions'] += md_fetcher.insert_transactions(rows, save=False)
+        counts['records'] += len(chunk)
+
+    chunk = []
+    for record in iter_qif_file(qif_path):
+        # opening balances and records without a D line are skipped rather than inserted
+        if is_opening_balance(record) or 'date' not in record:
+            counts['skipped'] += 1
+            continue
+        if duplicate_index is not None and \
+                duplicate_index.match(record['date'], record.get('amount', 0), record.get('payee', '')):
+            counts['duplicates'] += 1
+            continue
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            flush(chunk)
+            chunk = []
+    flush(chunk)
+    if counts['transactions'] > 0:
+        print("AccountBook Saved? {0}".format(md_fetcher.get_account_book().save()))
+    counts['unknown_category_names'] = sorted(unknown_categories)
+    print("QIF import: {0}".format(', '.join('{0} {1}'.format(k, v) for k, v in counts.items())))
+    return counts
+
+
+def main():
+    try:
+        qif_path = sys.argv[1] if len(sys.argv) > 1 else str(Path(MODULE_DIRECTORY, 'resources/sample.qif'))
+        md_folder = sys.argv[2] if len(sys.argv) > 2 else None
+        account_name = sys.argv[3] if len(sys.argv) > 3 else 'Checking'
+        if md_folder is None:
+            print("no data folder given, importing into a scratch copy of the sample data set...")
+            md_folder = str(Path(tempfile.mkdtemp(prefix='qifimporter_'), 'testMD02.moneydance'))
+            shutil.copytree(Path(MODULE_DIRECTORY, 'resources/testMD02.moneydance'), md_folder)
+        moneydance_jar_path = str(Path(MODULE_DIRECTORY, './lib/invextension_bundled.jar').absolute())
+        md_fetcher = MDFetcher(md_bundled_jar_location=moneydance_jar_path, md_file_location=md_folder)
+        import_qif(md_fetcher, qif_path, account_name)
+        md_fetcher.close_md_file()
+    except Exception as ex:
+        print("Exception in user code:")
+        print('-' * 60)
+        print(str(ex))
+        traceback.print_exc(file=sys.stdout)
+        print('-' * 60)
+
+
+if __name__ == '__main__':
+    main()
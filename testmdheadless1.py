@@ -79,7 +79,8 @@ accountCount = int(root_account.getSubAccounts().size())
 print("There are {0:d} sub-accounts in the rootAccount".format(accountCount))
 #%%
 print("printing details on last 10 parent transactions...")
-parent_txns = [x for x in txnSet.iterableTxns() if isinstance(x, ParentTxn)]
+# a generator, so only one transaction proxy is held at a time
+parent_txns = (x for x in txnSet.iterableTxns() if isinstance(x, ParentTxn))
 for txn in parent_txns:
     print("transaction date {0:d} account {1} description: {2} for amount {3}"
           .format(int(txn.getDateInt()), txn.getAccount().getAccountName(), txn.getDescription(),
@@ -95,16 +95,14 @@ print("now call up a 'BulkSecInfo object from investment reports")
 bulkSecInfo = BulkSecInfo(accountBook, reportConfig)
 
 #%%
-print("and list out currency price data from the 'BulkSecInfo object...")
+print("and list out currency price data, reading snapshot fields directly rather than parsing strings...")
 currency_data_py = []
-currencies_info_java = [x for x in bulkSecInfo.ListAllCurrenciesInfo()]
-for currency_info in currencies_info_java:
-    currency_data_py.append(list(ele.strip(" '[]") for ele in str(currency_info).split(',')))
-header = [x.strip() for x in str(BulkSecInfo.listCurrencySnapshotHeader()).split(',')]
-all_currencies_info = pd.DataFrame(data=currency_data_py, columns=header)
-all_currencies_info['Date'] = all_currencies_info['Date'].astype('datetime64[ns]')
-for item in ['PricebyDate', 'PriceByDate(Adjust)']:
-    all_currencies_info[item] = all_currencies_info[item].astype('float')
+for currency in accountBook.getCurrencies().getAllCurrencies():
+    currency_id, name, ticker = str(currency.getUUID()), str(currency.getName()), str(currency.getTickerSymbol())
+    for snapshot in currency.getSnapshots():
+        currency_data_py.append((currency_id, name, ticker, int(snapshot.getDateInt()), 1. / snapshot.getRate()))
+all_currencies_info = pd.DataFrame(data=currency_data_py, columns=['id', 'Name', 'Ticker', 'Date', 'PricebyDate'])
+all_currencies_info['Date'] = pd.to_datetime(all_currencies_info['Date'].astype(str), format='%Y%m%d')
 print(all_currencies_info.iloc[:10, :].to_string(index=False))
 
 #%%
@@ -20,6 +20,7 @@ import re
 import itertools
 
 from pyaccountwrapper import PyAccountWrapper, get_accounts_list_from_md_data, close_account_book
+from pricestore import PriceStore
 
 pd.set_option('display.max_columns', 500)
 pd.set_option('display.max_rows', 500)
@@ -44,6 +45,17 @@ for account_wrapper in account_wrappers:
 net_worth_df: pd.DataFrame = pd.DataFrame.from_records(account_worths)
 print(net_worth_df)
 # %%
+print("load all security prices into memory once, and value the accounts from there")
+price_store = PriceStore.from_account_book(account_book)
+for account_wrapper in account_wrappers:
+    account_wrapper.set_price_store(price_store)
+print(price_store.get_currencies())
+# %%
+print("generate a month-start net worth series for the same period in one pass per account")
+net_worth_series_df: pd.DataFrame = pd.concat([account_wrapper.get_net_worth_series(20090801, 20100401, 'MS')
+                                               for account_wrapper in account_wrappers], ignore_index=True)
+print(net_worth_series_df.groupby('date')['total'].sum())
+# %%
 close_account_book(account_book)
 
 # %%
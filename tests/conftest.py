@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# the modules live flat in the project root, as the scripts there import them
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
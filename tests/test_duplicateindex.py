@@ -0,0 +1,42 @@
+from duplicateindex import DuplicateIndex, normalize_payee, date_int_to_ordinal
+
+
+def test_normalize_payee_ignores_case_and_punctuation():
+    assert normalize_payee('  AMAZON.com*Mktp ') == normalize_payee('amazon com mktp')
+
+
+def test_match_within_date_window():
+    index = DuplicateIndex([(20200210, -2500, 'Walmart')], date_window=3)
+    assert index.contains(20200213, -2500, 'WALMART')
+    assert index.contains(20200207, -2500, 'walmart')
+    assert not index.contains(20200214, -2500, 'Walmart')
+    assert not index.contains(20200210, -2501, 'Walmart')
+    assert not index.contains(20200210, -2500, 'Target')
+
+
+def test_window_spans_month_end():
+    index = DuplicateIndex([(20200228, 100, 'payee')], date_window=2)
+    assert index.contains(20200301, 100, 'payee')
+
+
+def test_match_consumes_one_entry():
+    index = DuplicateIndex([(20200210, -1000, 'Target'), (20200210, -1000, 'Target')])
+    assert len(index) == 2
+    assert index.match(20200210, -1000, 'Target')
+    assert index.match(20200211, -1000, 'Target')
+    assert not index.match(20200210, -1000, 'Target')
+    assert len(index) == 0
+
+
+def test_match_prefers_nearest_day():
+    index = DuplicateIndex([(20200208, 500, 'payee'), (20200210, 500, 'payee')], date_window=3)
+    assert index.match(20200210, 500, 'payee')
+    # the exact-day entry was consumed, so the one two days away is left
+    assert index.find(20200210, 500, 'payee')[2] == date_int_to_ordinal(20200208)
+
+
+def test_contains_does_not_consume():
+    index = DuplicateIndex([(20200210, 500, 'payee')])
+    assert index.contains(20200210, 500, 'payee')
+    assert index.contains(20200210, 500, 'payee')
+    assert len(index) == 1
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+from pricestore import PriceStore
+
+
+class FakeSnapshot(object):
+    def __init__(self, date_int, rate):
+        self.date_int, self.rate = date_int, rate
+
+    def getDateInt(self):
+        return self.date_int
+
+    def getRate(self):
+        return self.rate
+
+
+class FakeCurrency(object):
+    def __init__(self, uuid, ticker, relative_rate, snapshots=()):
+        self.uuid, self.ticker, self.relative_rate = uuid, ticker, relative_rate
+        self.snapshots = [FakeSnapshot(date_int, rate) for date_int, rate in snapshots]
+
+    def getUUID(self):
+        return self.uuid
+
+    def getTickerSymbol(self):
+        return self.ticker
+
+    def getName(self):
+        return self.ticker + ' name'
+
+    def getRelativeRate(self):
+        return self.relative_rate
+
+    def getSnapshots(self):
+        return self.snapshots
+
+
+def make_store():
+    # snapshots deliberately out of date order, as the store sorts them
+    return PriceStore([FakeCurrency('uuid-aaa', 'AAA', 0.2, [(20200201, 0.25), (20200101, 0.5)]),
+                       FakeCurrency('uuid-bbb', 'BBB', 0.1)])
+
+
+def test_rate_as_of_uses_latest_snapshot_on_or_before_date():
+    rates = make_store().rate_as_of('AAA', [20200101, 20200115, 20200201, 20300101])
+    np.testing.assert_array_equal(rates, [0.5, 0.5, 0.25, 0.25])
+
+
+def test_rate_before_first_snapshot_takes_earliest_rate():
+    np.testing.assert_array_equal(make_store().rate_as_of('AAA', 20191231), [0.5])
+
+
+def test_rate_without_snapshots_takes_current_rate():
+    np.testing.assert_array_equal(make_store().rate_as_of('BBB', [19000101, 20200115]), [0.1, 0.1])
+
+
+def test_unknown_keys_are_nan():
+    rates = make_store().rate_as_of(['AAA', 'ZZZ', 'uuid-bbb'], 20200115)
+    np.testing.assert_array_equal(rates, [0.5, np.nan, 0.1])
+    assert np.isnan(make_store().rate_as_of(['ZZZ', 'YYY'], 20200115)).all()
+
+
+def test_keys_and_timestamp_dates():
+    store = make_store()
+    assert 'uuid-aaa' in store and 'AAA' in store and 'ZZZ' not in store
+    rates = store.rate_as_of('uuid-aaa', pd.to_datetime(['2019-06-30', '2020-02-01']))
+    np.testing.assert_array_equal(rates, [0.5, 0.25])
+    np.testing.assert_array_equal(store.price_as_of('AAA', 20200201), [4.])
+
+
+def test_empty_store():
+    store = PriceStore([])
+    assert len(store) == 0
+    assert np.isnan(store.rate_as_of('AAA', 20200101)).all()
@@ -0,0 +1,85 @@
+from pathlib import Path
+
+import pytest
+
+from qifimporter import parse_qif_date, parse_qif_amount, iter_qif_records, iter_qif_file, is_opening_balance, \
+    get_category_key, qif_records_to_rows
+
+SAMPLE_QIF = str(Path(__file__).resolve().parent.parent / 'resources' / 'sample.qif')
+
+
+@pytest.mark.parametrize('qif_date, date_int', [("2/10'2020", 20200210), ("2/10'20", 20200210),
+                                                ('02/10/2020', 20200210), ('02-10-20', 20200210),
+                                                ('2020-02-10', 20200210), ('12/31/99', 19991231),
+                                                (" 1/ 5'2021", 20210105)])
+def test_parse_qif_date(qif_date, date_int):
+    assert parse_qif_date(qif_date) == date_int
+
+
+def test_parse_qif_date_rejects_unknown_format():
+    with pytest.raises(ValueError):
+        parse_qif_date('20200210')
+
+
+def test_parse_qif_amount_is_exact_cents():
+    assert parse_qif_amount('-1,234.56') == -123456
+    assert parse_qif_amount('0.1') == 10
+
+
+def test_sample_records():
+    records = list(iter_qif_file(SAMPLE_QIF))
+    assert len(records) == 6
+    assert all(record['type'] == 'Bank' for record in records)
+    assert [record['first'] for record in records] == [True] + [False] * 5
+    assert [record['date'] for record in records] == [20200210, 20200214, 20200214, 20200212, 20200211, 20200210]
+    split_record = records[1]
+    assert split_record['amount'] == 6750
+    assert [split['amount'] for split in split_record['splits']] == [-1500, 8250]
+    assert split_record['splits'][0]['memo'] == 'sign up credit'
+    assert records[4]['number'] == '123'
+
+
+def test_opening_balance_is_only_the_first_record():
+    records = list(iter_qif_file(SAMPLE_QIF))
+    assert [is_opening_balance(record) for record in records] == [True] + [False] * 5
+    # the same payee later in the file is an ordinary transaction
+    later = dict(records[0], first=False)
+    assert not is_opening_balance(later)
+
+
+def test_non_transaction_sections_are_skipped():
+    lines = ['!Type:Cat', 'NFood', '^', '!Type:Bank', 'D1/2/2020', 'T-1.00', 'PShop', '^']
+    records = list(iter_qif_records(lines))
+    assert len(records) == 1
+    assert records[0]['first'] and records[0]['payee'] == 'Shop'
+
+
+def test_get_category_key():
+    assert get_category_key('[Checking]') == 'Checking'
+    assert get_category_key('Food:Groceries/Vacation') == 'Food:Groceries'
+
+
+def test_records_to_rows_keep_check_number_and_splits():
+    records = list(iter_qif_file(SAMPLE_QIF))
+    rows = qif_records_to_rows(records[1:], 'Checking')
+    assert sum(row['txn'] == 0 for row in rows) == 2
+    assert [row['amount'] for row in rows if row['txn'] == 0] == [-1500, 8250]
+    assert {row['check_number'] for row in rows if row['txn'] == 3} == {'123'}
+
+
+def test_multi_account_export_header():
+    lines = ['!Option:AutoSwitch', '!Account', 'NChecking', 'TBank', '^', '!Clear:AutoSwitch',
+             '!Type:Bank', "D2/10'2020", 'T0.00', 'POpening Balance', 'L[Checking]', '^',
+             "D2/11'2020", 'T-25.00', 'PWalmart', 'LFood:Groceries', '^',
+             '!Account', 'NSavings', 'TBank', '^',
+             '!Type:Bank', "D2/12'2020", 'T100.00', 'PTransfer', 'L[Checking]', '^']
+    records = list(iter_qif_records(lines))
+    assert [record['date'] for record in records] == [20200210, 20200211, 20200212]
+    assert [is_opening_balance(record) for record in records] == [True, False, False]
+    assert records[2]['first']
+
+
+def test_record_without_date_keeps_none():
+    records = list(iter_qif_records(['!Type:Bank', 'T-1.00', 'PShop', '^']))
+    assert 'date' not in records[0]
+    assert qif_records_to_rows(records, 'Checking')[0]['date'] is None